@@ -11,6 +11,9 @@ def on_collection_loaded(col):
 
 gui_hooks.collection_did_load.append(on_collection_loaded)
 
+# Editor and reviewer assets (and cached backgrounds) are loaded by URL from the add-on folder
+mw.addonManager.setWebExports(__name__, r"(web/.*\.(js|css)|user_files/bg_cache/.*\.(jpg|png))")
+
 def on_open_manager():
     # We keep a reference to avoid GC
     mw.mindmap_manager = MindMapManager(mw)
@@ -57,6 +60,18 @@ action_backup = QAction("Backup & Recovery", mw)
 from .mindmap_backup import show_backup_dialog
 action_backup.triggered.connect(show_backup_dialog)
 
+action_diagnostics = QAction("Diagnostics", mw)
+from .diagnostics import show_diagnostics_dialog
+action_diagnostics.triggered.connect(show_diagnostics_dialog)
+
+action_rebuild_links = QAction("Rebuild Link Index", mw)
+from .link_index import on_rebuild_action
+action_rebuild_links.triggered.connect(on_rebuild_action)
+
+action_migrate_links = QAction("Convert Links to Tags", mw)
+from .link_encoding import on_migrate_action
+action_migrate_links.triggered.connect(on_migrate_action)
+
 action_quick = QAction("Quick Open Mind Map", mw)
 action_quick.triggered.connect(open_last_mindmap)
 # Get shortcut from config, default to Ctrl+M
@@ -70,11 +85,23 @@ menu = mw.form.menuTools.addMenu("Mind Map")
 menu.addAction(action_manager)
 menu.addAction(action_usage)
 menu.addAction(action_backup)
+menu.addAction(action_diagnostics)
+menu.addAction(action_rebuild_links)
+menu.addAction(action_migrate_links)
 menu.addSeparator()
 menu.addAction(action_quick)
 
 from .card_linker import init_card_linker
 init_card_linker()
 
+from .link_index import init_link_index
+init_link_index()
+
+from .integrity_checker import init_integrity_checker
+init_integrity_checker()
+
+from .editor_pool import init_editor_pool
+init_editor_pool()
+
 # Import review indicator for mind map associations
 from . import review_indicator
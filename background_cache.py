@@ -0,0 +1,81 @@
+"""
+Cached, screen-sized copies of editor background images
+Images from the backgrounds folder are downscaled and recompressed once per
+(file, mtime, screen size) into user_files/bg_cache and served to the editor
+by URL, so opening a themed map never embeds the original image.
+"""
+import hashlib
+import os
+from aqt import mw
+from aqt.qt import QImage, Qt
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), "user_files", "bg_cache")
+JPEG_QUALITY = 85
+
+# (source path, mtime, width, height) -> URL
+_urls = {}
+
+
+def _cache_name(path, mtime, width, height):
+    slug = hashlib.sha1(path.encode('utf-8')).hexdigest()[:10]
+    return slug, f"{slug}_{mtime}_{width}x{height}"
+
+
+def _url(filename):
+    addon_package = mw.addonManager.addonFromModule(__name__)
+    return f"{mw.serverURL()}_addons/{addon_package}/user_files/bg_cache/{filename}"
+
+
+def _write_scaled(path, target, width, height):
+    image = QImage(path)
+    if image.isNull():
+        raise ValueError(f"Cannot read image {path}")
+    # Cover the screen without upscaling small images
+    if image.width() > width or image.height() > height:
+        image = image.scaled(width, height, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                             Qt.TransformationMode.SmoothTransformation)
+    if image.hasAlphaChannel():
+        target += ".png"
+        ok = image.save(target, "PNG")
+    else:
+        target += ".jpg"
+        ok = image.save(target, "JPEG", JPEG_QUALITY)
+    if not ok:
+        raise ValueError(f"Cannot write {target}")
+    return target
+
+
+def background_url(path, width, height):
+    """URL of a cached copy of `path` sized for a width x height screen, or None"""
+    try:
+        mtime = int(os.path.getmtime(path))
+    except OSError:
+        return None
+    key = (path, mtime, width, height)
+    url = _urls.get(key)
+    if url:
+        return url
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    slug, name = _cache_name(path, mtime, width, height)
+    existing = [f for f in os.listdir(CACHE_DIR) if f.startswith(name + ".")]
+    if existing:
+        filename = existing[0]
+    else:
+        # Drop copies made from an older version of this file
+        for stale in os.listdir(CACHE_DIR):
+            if stale.startswith(slug + "_") and not stale.startswith(f"{slug}_{mtime}_"):
+                try:
+                    os.remove(os.path.join(CACHE_DIR, stale))
+                except OSError:
+                    pass
+        try:
+            target = _write_scaled(path, os.path.join(CACHE_DIR, name), width, height)
+        except Exception as e:
+            print(f"Error caching background image: {e}")
+            return None
+        filename = os.path.basename(target)
+
+    url = _url(filename)
+    _urls[key] = url
+    return url
@@ -1,42 +1,47 @@
-import json
 import re
+from contextlib import contextmanager
 from aqt import mw
 from aqt.qt import *
 from aqt import gui_hooks
 from aqt.utils import showInfo, tooltip
 from .note_manager import get_or_create_mindmap_model
 from .mindmap_editor import MindMapDialog
+from .static_renderer import store_map_data
+from . import node_index
+from . import link_encoding
+from . import map_stats
 
 # Flags to prevent sync loop
 _syncing_from_card = False
-_syncing_from_node = False
+# Notes currently being written by the mind map editor (node -> card sync)
+_node_sync_note_ids = set()
+
+
+@contextmanager
+def suppress_card_sync(note_ids):
+    """Skip card -> mind map sync for these notes while the editor writes them"""
+    note_ids = set(note_ids)
+    _node_sync_note_ids.update(note_ids)
+    try:
+        yield
+    finally:
+        _node_sync_note_ids.difference_update(note_ids)
 
 # --- Editor Integration ---
 
 def sync_card_to_mindmap(note):
     """Sync first line from card front to mindmap node when card is updated"""
-    global _syncing_from_card, _syncing_from_node
+    global _syncing_from_card
     
     # Prevent sync loop
-    if _syncing_from_node:
+    if note.id in _node_sync_note_ids:
         return
     
-    # Check if note has mind map link
-    mindmap_id = None
-    node_id = None
-    
-    for field_name in note.keys():
-        field_content = note[field_name]
-        # Find mindmap-link div
-        pattern = r'<div id="mindmap-link"\s+data-mid="(\d+)"\s+data-nid="([^"]+)"\s+style="display:none;">\s*</div>'
-        match = re.search(pattern, field_content)
-        if match:
-            mindmap_id = int(match.group(1))
-            node_id = match.group(2)
-            break
-    
-    if not mindmap_id or not node_id:
+    # Check if note has mind map link (div or tag)
+    link = link_encoding.read_link(note)
+    if not link:
         return  # No link, no need to sync
+    mindmap_id, node_id, _ = link
     
     # Get first line of card front
     if 'Front' not in note:
@@ -56,28 +61,16 @@ def sync_card_to_mindmap(note):
         _syncing_from_card = True
         
         mm_note = mw.col.get_note(mindmap_id)
-        data_str = mm_note['Data']
-        data = json.loads(data_str)
+        node = node_index.get_index(mm_note).get(node_id)
         
-        # Recursively find and update node
-        def update_node(node):
-            if isinstance(node, dict):
-                if node.get('id') == node_id:
-                    old_topic = node.get('topic', '')
-                    if old_topic != first_line:
-                        node['topic'] = first_line
-                        print(f"Synced card to mindmap: '{old_topic}' -> '{first_line}'")
-                        return True
-                if 'children' in node:
-                    for child in node['children']:
-                        if update_node(child):
-                            return True
-            return False
-        
-        if 'data' in data:
-            if update_node(data['data']):
-                mm_note['Data'] = json.dumps(data)
-                mw.col.update_note(mm_note)
+        if node is not None and node.get('topic', '') != first_line:
+            data = node_index.take(mm_note).data
+            old_topic = node.get('topic', '')
+            node['topic'] = first_line
+            print(f"Synced card to mindmap: '{old_topic}' -> '{first_line}'")
+            store_map_data(mm_note, data)
+            mw.col.update_note(mm_note)
+            map_stats.record_map(mw.col, mm_note, data)
                 
     except Exception as e:
         print(f"Error syncing card to mindmap: {e}")
@@ -92,69 +85,44 @@ def on_editor_load_note(editor):
         # Existing card - always read actual link state from card data
         # Don't use editor.mindmap_selection to avoid showing wrong association in browser
         try:
-            # Find mindmap-link div in all fields
-            for field_name in editor.note.keys():
-                field_content = editor.note[field_name]
-                if 'mindmap-link' in field_content and 'data-mid=' in field_content:
-                    # Extract mind map ID and node ID
-                    match_mid = re.search(r'data-mid="(\d+)"', field_content)
-                    match_nid = re.search(r'data-nid="([^"]+)"', field_content)
+            # Find the mind map link (hidden div or tag)
+            link = link_encoding.read_link(editor.note)
+            if link:
+                mindmap_id, node_id, _ = link
+                
+                # Validate: Check if mindmap still exists
+                try:
+                    mm_note = mw.col.get_note(mindmap_id)
+                    mindmap_title = mm_note['Title']
                     
-                    if match_mid and match_nid:
-                        mindmap_id = int(match_mid.group(1))
-                        node_id = match_nid.group(1)
-                        
-                        # Validate: Check if mindmap still exists
-                        try:
-                            mm_note = mw.col.get_note(mindmap_id)
-                            mindmap_title = mm_note['Title']
-                            
-                            # Validate: Check if node still exists in mindmap
-                            data_str = mm_note['Data']
-                            data = json.loads(data_str)
-                            
-                            node_exists = False
-                            def check_node_exists(node):
-                                nonlocal node_exists
-                                if isinstance(node, dict):
-                                    if node.get('id') == node_id:
-                                        node_exists = True
-                                        return
-                                    if 'children' in node:
-                                        for child in node['children']:
-                                            check_node_exists(child)
-                            
-                            if 'data' in data:
-                                check_node_exists(data['data'])
-                            
-                            if not node_exists:
-                                # Node was deleted from mindmap, cleanup card link
-                                print(f"Node {node_id} no longer exists in mindmap {mindmap_id}, cleaning up card link")
-                                remove_link_from_card(editor.note, field_name)
-                                reset_mindmap_button(editor)
-                                return
-                            
-                            # Link is valid, show it
-                            editor.mindmap_selection = {
-                                'id': mindmap_id,
-                                'title': mindmap_title
-                            }
-                            editor.note.mindmap_selection = editor.mindmap_selection
-                            
-                            # Delay button update to ensure button is rendered
-                            from aqt.qt import QTimer
-                            QTimer.singleShot(300, lambda: update_mindmap_button(editor, mindmap_title))
-                            
-                            print(f"Loaded existing mindmap link: {mindmap_title}")
-                            return
-                            
-                        except Exception as e:
-                            # Mindmap was deleted, cleanup card link
-                            print(f"Mindmap {mindmap_id} no longer exists, cleaning up card link: {e}")
-                            remove_link_from_card(editor.note, field_name)
-                            reset_mindmap_button(editor)
-                            return
-                    break
+                    # Validate: Check if node still exists in mindmap
+                    if node_index.get_index(mm_note).get(node_id) is None:
+                        # Node was deleted from mindmap, cleanup card link
+                        print(f"Node {node_id} no longer exists in mindmap {mindmap_id}, cleaning up card link")
+                        remove_link_from_card(editor.note, mindmap_id)
+                        reset_mindmap_button(editor)
+                        return
+                    
+                    # Link is valid, show it
+                    editor.mindmap_selection = {
+                        'id': mindmap_id,
+                        'title': mindmap_title
+                    }
+                    editor.note.mindmap_selection = editor.mindmap_selection
+                    
+                    # Delay button update to ensure button is rendered
+                    from aqt.qt import QTimer
+                    QTimer.singleShot(300, lambda: update_mindmap_button(editor, mindmap_title))
+                    
+                    print(f"Loaded existing mindmap link: {mindmap_title}")
+                    return
+                    
+                except Exception as e:
+                    # Mindmap was deleted, cleanup card link
+                    print(f"Mindmap {mindmap_id} no longer exists, cleaning up card link: {e}")
+                    remove_link_from_card(editor.note, mindmap_id)
+                    reset_mindmap_button(editor)
+                    return
             
             # If no association found, clear any leftover selection state in editor
             if hasattr(editor, 'mindmap_selection'):
@@ -177,18 +145,10 @@ def on_editor_load_note(editor):
                 QTimer.singleShot(300, lambda: update_mindmap_button(editor, editor.mindmap_selection['title']))
                 return
 
-def remove_link_from_card(note, field_name):
-    """Remove mindmap-link div from card field"""
+def remove_link_from_card(note, mindmap_id=None):
+    """Remove mind map links (divs and tags) from a card, only those to mindmap_id if given"""
     try:
-        field_content = note[field_name]
-        new_content = re.sub(
-            r'<div[^>]*id="mindmap-link"[^>]*>.*?</div>\s*',
-            '',
-            field_content,
-            flags=re.DOTALL | re.IGNORECASE
-        )
-        if new_content != field_content:
-            note[field_name] = new_content
+        if link_encoding.remove_links(note, mindmap_id):
             mw.col.update_note(note)
             print(f"Removed invalid mindmap link from card {note.id}")
     except Exception as e:
@@ -208,20 +168,8 @@ def clear_mindmap_selection(editor):
     # Remove mindmap-link div from all card fields
     if editor.note and editor.note.id:
         try:
-            modified = False
-            for field_name in editor.note.keys():
-                field_content = editor.note[field_name]
-                if 'mindmap-link' in field_content:
-                    # Remove mindmap-link div
-                    new_content = re.sub(
-                        r'<div[^>]*id="mindmap-link"[^>]*>.*?</div>\s*',
-                        '',
-                        field_content,
-                        flags=re.DOTALL | re.IGNORECASE
-                    )
-                    if new_content != field_content:
-                        editor.note[field_name] = new_content
-                        modified = True
+            # Remove mindmap-link divs and link tags
+            modified = link_encoding.remove_links(editor.note)
             
             # Update note if modified
             if modified:
@@ -266,69 +214,43 @@ def reset_mindmap_button(editor):
         print(f"Error resetting button: {e}")
 
 def on_editor_btn_click(editor):
-    # Get all mind maps
-    ids = mw.col.find_notes('"note:MindMap Master"')
-    if not ids:
+    # Get all mind maps (titles and active flags only, see map_catalog.py)
+    from .map_catalog import list_maps
+    maps = list_maps()
+    if not maps:
         tooltip("No Mind Maps found. Create one first from Tools > Mind Map > Mind Map Manager")
         return
     
-    # Create menu
-    menu = QMenu(editor.parentWindow)
-    menu.setTitle("Select Mind Map")
-    
-    # Add "No Association" option
-    clear_action = menu.addAction("❌")
-    clear_action.setData(None)  # Use None to identify clear operation
-    menu.addSeparator()  # Add separator line
-    
-    # Filter and add only active mind maps
-    active_count = 0
-    for nid in ids:
-        note = mw.col.get_note(nid)
-        # Check if this mind map allows new cards (default to "1" if field doesn't exist)
-        try:
-            allow_new = note['AllowNewCards']
-        except KeyError:
-            allow_new = '1'  # Default to active if field doesn't exist
-        
-        if allow_new == "1":  # Only show active mind maps
-            title = note['Title']
-            action = menu.addAction(title)
-            action.setData(nid)  # Store note ID in action
-            active_count += 1
-    
-    if active_count == 0:
-        # No active mind maps, show info
-        info_action = menu.addAction("(No active mind maps)")
-        info_action.setEnabled(False)
+    # Only active mind maps can take new cards
+    active = [info for info in maps if info.allow_new]
+    if not active:
+        tooltip("No active mind maps")
+    titles = {info.id: info.title for info in active}
     
-    # Show menu at button position (or cursor)
-    # Get cursor position as fallback
-    cursor_pos = QCursor.pos()
-    action = menu.exec(cursor_pos)
+    # Searchable picker at the cursor (see map_picker.py)
+    from .map_picker import pick_map, CLEAR
+    nid = pick_map(active, editor.parentWindow)
     
-    if action:
-        nid = action.data()
-        
-        if nid is None:  # User selected "No Association"
+    if nid is not None:
+        if nid == CLEAR:  # User selected "No Association"
             clear_mindmap_selection(editor)
             tooltip("已取消思维导图关联")
         else:  # User selected a mind map
-            note = mw.col.get_note(nid)
+            title = titles[nid]
             editor.mindmap_selection = {
                 'id': nid,
-                'title': note['Title']
+                'title': title
             }
-            tooltip(f"Selected Mind Map: {note['Title']}")
+            tooltip(f"Selected Mind Map: {title}")
             # Store on the note object so we can access it in note_added
             editor.note.mindmap_selection = editor.mindmap_selection
             
             # Update button text to show selected mindmap
-            update_mindmap_button(editor, note['Title'])
+            update_mindmap_button(editor, title)
             
             # If this is an existing card (has ID), link it immediately
             if editor.note.id:
-                link_existing_card_to_mindmap(editor.note, nid, note['Title'])
+                link_existing_card_to_mindmap(editor.note, nid, title)
 
 def update_mindmap_button(editor, mindmap_title):
     """Update the MM button to show the selected mindmap name"""
@@ -397,38 +319,24 @@ def link_existing_card_to_mindmap(card_note, mindmap_id, mindmap_title):
         # Check if card already has a link to this mindmap
         has_existing_link = False
         existing_node_id = None
-        for field_name in card_note.keys():
-            field_content = card_note[field_name]
-            if f'data-mid="{mindmap_id}"' in field_content:
-                # Extract node ID from existing link
-                match = re.search(r'data-nid="([^"]+)"', field_content)
-                if match:
-                    existing_node_id = match.group(1)
-                    has_existing_link = True
+        for link_mid, link_nid, _ in link_encoding.iter_links(card_note):
+            if link_mid == mindmap_id:
+                existing_node_id = link_nid
+                has_existing_link = True
                 break
         
         # Load mindmap data
         mm_note = mw.col.get_note(mindmap_id)
-        data_str = mm_note['Data']
-        data = json.loads(data_str)
+        index = node_index.take(mm_note)
+        data = index.data
         
         if has_existing_link and existing_node_id:
             # Update existing node to add noteId
-            def update_node_with_noteid(node):
-                if isinstance(node, dict):
-                    if node.get('id') == existing_node_id:
-                        node['noteId'] = card_note.id
-                        node['topic'] = first_line  # Also update topic
-                        print(f"Updated existing node {existing_node_id} with noteId {card_note.id}")
-                        return True
-                    if 'children' in node:
-                        for child in node['children']:
-                            if update_node_with_noteid(child):
-                                return True
-                return False
-            
-            if 'data' in data:
-                update_node_with_noteid(data['data'])
+            node = index.get(existing_node_id)
+            if node is not None:
+                node['noteId'] = card_note.id
+                node['topic'] = first_line  # Also update topic
+                print(f"Updated existing node {existing_node_id} with noteId {card_note.id}")
         else:
             # Create new node
             import uuid
@@ -448,31 +356,14 @@ def link_existing_card_to_mindmap(card_note, mindmap_id, mindmap_title):
                 root['children'] = []
             root['children'].append(new_node)
             
-            # Add link div to card if not exists
-            field_to_update = None
-            if 'Back' in card_note:
-                field_to_update = 'Back'
-            elif 'Back Extra' in card_note:
-                field_to_update = 'Back Extra'
-            elif 'Extra' in card_note:
-                field_to_update = 'Extra'
-            elif len(card_note.fields) > 1:
-                field_to_update = list(card_note.keys())[-1]
-            
-            if field_to_update:
-                link_html = f"""
-<div id="mindmap-link" 
-     data-mid="{mindmap_id}" 
-     data-nid="{new_node_id}" 
-     style="display:none;">
-</div>
-"""
-                card_note[field_to_update] += link_html
+            # Add link (div or tag) to card if not exists
+            if link_encoding.add_link(card_note, mindmap_id, new_node_id):
                 mw.col.update_note(card_note)
         
         # Save mindmap
-        mm_note['Data'] = json.dumps(data)
+        store_map_data(mm_note, data)
         mw.col.update_note(mm_note)
+        map_stats.record_map(mw.col, mm_note, data)
         
         tooltip(f"Linked existing card to '{mindmap_title}'")
         
@@ -523,8 +414,7 @@ def on_note_added(note):
     # Update Mind Map
     try:
         mm_note = mw.col.get_note(mindmap_id)
-        data_str = mm_note['Data']
-        data = json.loads(data_str)
+        data = node_index.take(mm_note).data
         
         # Generate new node ID
         import uuid
@@ -546,31 +436,13 @@ def on_note_added(note):
         root['children'].append(new_node)
         
         # Save Mind Map
-        mm_note['Data'] = json.dumps(data)
+        store_map_data(mm_note, data)
         mw.col.update_note(mm_note)
+        map_stats.record_map(mw.col, mm_note, data)
         
         # Add Link to Card
-        # We append a hidden div to the Back field or similar
-        field_to_update = None
-        if 'Back' in note:
-            field_to_update = 'Back'
-        elif 'Back Extra' in note:
-            field_to_update = 'Back Extra'
-        elif 'Extra' in note:
-            field_to_update = 'Extra'
-        elif len(note.fields) > 1:
-             # Fallback to the last field if it's not the first one
-            field_to_update = list(note.keys())[-1]
-            
-        if field_to_update:
-            link_html = f"""
-<div id="mindmap-link" 
-     data-mid="{mindmap_id}" 
-     data-nid="{new_node_id}" 
-     style="display:none;">
-</div>
-"""
-            note[field_to_update] += link_html
+        # A hidden div in the Back field or similar, or a mindmap:: tag
+        if link_encoding.add_link(note, mindmap_id, new_node_id):
             mw.col.update_note(note)
             
         tooltip(f"Added node '{first_line}' to Mind Map")
@@ -579,50 +451,6 @@ def on_note_added(note):
         showInfo(f"Error linking to mind map: {e}")
 
 
-def validate_and_cleanup_mindmap(mindmap_note):
-    """Validate and cleanup nodes in mindmap - remove noteId if card doesn't exist"""
-    try:
-        data_str = mindmap_note['Data']
-        data = json.loads(data_str)
-        
-        modified = False
-        
-        def cleanup_node(node):
-            nonlocal modified
-            if isinstance(node, dict):
-                # Check if node has noteId
-                if 'noteId' in node:
-                    note_id = node['noteId']
-                    # Check if card still exists
-                    try:
-                        card_note = mw.col.get_note(note_id)
-                        # Card exists, no cleanup needed
-                    except:
-                        # Card was deleted, remove noteId
-                        print(f"Card {note_id} no longer exists, removing noteId from node {node.get('id')}")
-                        del node['noteId']
-                        modified = True
-                
-                # Recursively check children
-                if 'children' in node:
-                    for child in node['children']:
-                        cleanup_node(child)
-        
-        if 'data' in data:
-            cleanup_node(data['data'])
-        
-        # Save if modified
-        if modified:
-            mindmap_note['Data'] = json.dumps(data)
-            mw.col.update_note(mindmap_note)
-            print(f"Cleaned up mindmap {mindmap_note.id}: removed {modified} invalid noteId references")
-            
-    except Exception as e:
-        print(f"Error validating mindmap: {e}")
-
-
-# --- Initialization ---
-
 def init_card_linker():
     gui_hooks.editor_did_init_buttons.append(add_editor_button)
     gui_hooks.editor_did_load_note.append(on_editor_load_note)  # Added: sync selection state
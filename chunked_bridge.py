@@ -0,0 +1,113 @@
+"""
+Chunked transport for large payloads between MindMapDialog and main.js
+Payloads above CHUNK_THRESHOLD are split into numbered chunks, each with a
+CRC32 of its UTF-8 bytes, and every chunk is acknowledged before the next
+one is sent, so neither side builds one huge bridge message.
+"""
+import json
+import zlib
+
+# Keep these in sync with main.js
+CHUNK_THRESHOLD = 256 * 1024
+CHUNK_SIZE = 128 * 1024
+MAX_RETRIES = 3
+
+
+class ChunkError(Exception):
+    """Raised when a chunk is out of order or fails its checksum"""
+
+
+def chunk_checksum(chunk):
+    return zlib.crc32(chunk.encode('utf-8'))
+
+
+def split_chunks(text):
+    return [text[i:i + CHUNK_SIZE] for i in range(0, len(text), CHUNK_SIZE)]
+
+
+class ChunkAssembler:
+    """Reassembles chunked payloads sent by main.js"""
+
+    def __init__(self):
+        self._transfers = {}
+
+    def add(self, header, chunk):
+        """
+        Store one chunk
+
+        Returns:
+            tuple: (cmd, text) once the payload is complete, otherwise None
+        """
+        transfer_id = header['id']
+        seq = header['seq']
+        parts = self._transfers.setdefault(transfer_id, [])
+        if seq != len(parts):
+            raise ChunkError(f"Chunk {seq} of {transfer_id} out of order, expected {len(parts)}")
+        if chunk_checksum(chunk) != header['checksum']:
+            raise ChunkError(f"Checksum mismatch for chunk {seq} of {transfer_id}")
+        parts.append(chunk)
+        if len(parts) < header['total']:
+            return None
+        del self._transfers[transfer_id]
+        return header['cmd'], ''.join(parts)
+
+    def discard(self, transfer_id):
+        self._transfers.pop(transfer_id, None)
+
+    def pending(self):
+        """True while a payload is partly received"""
+        return bool(self._transfers)
+
+
+class ChunkSender:
+    """Pushes large payloads to main.js one acknowledged chunk at a time"""
+
+    def __init__(self, web):
+        self.web = web
+        self._transfers = {}
+        self._counter = 0
+
+    def send(self, cmd, text):
+        """Send `text` to the JS handler for `cmd`, chunked if it is large"""
+        if len(text) <= CHUNK_THRESHOLD:
+            return False
+        self._counter += 1
+        transfer_id = f"py{self._counter}"
+        self._transfers[transfer_id] = {'cmd': cmd, 'chunks': split_chunks(text), 'retries': 0}
+        self._send_chunk(transfer_id, 0)
+        return True
+
+    def _send_chunk(self, transfer_id, seq):
+        transfer = self._transfers[transfer_id]
+        chunk = transfer['chunks'][seq]
+        header = {
+            'id': transfer_id,
+            'seq': seq,
+            'total': len(transfer['chunks']),
+            'cmd': transfer['cmd'],
+            'checksum': chunk_checksum(chunk),
+        }
+        self.web.eval(f"if(typeof receiveChunk === 'function') receiveChunk({json.dumps(header)}, {json.dumps(chunk)});")
+
+    def ack(self, transfer_id, seq):
+        """JS stored chunk `seq`; send the next one"""
+        transfer = self._transfers.get(transfer_id)
+        if not transfer:
+            return
+        transfer['retries'] = 0
+        if seq + 1 >= len(transfer['chunks']):
+            del self._transfers[transfer_id]
+        else:
+            self._send_chunk(transfer_id, seq + 1)
+
+    def nack(self, transfer_id, seq):
+        """JS rejected chunk `seq`; resend it a few times before giving up"""
+        transfer = self._transfers.get(transfer_id)
+        if not transfer:
+            return
+        transfer['retries'] += 1
+        if transfer['retries'] > MAX_RETRIES:
+            print(f"Giving up on transfer {transfer_id} after {MAX_RETRIES} retries")
+            del self._transfers[transfer_id]
+        else:
+            self._send_chunk(transfer_id, seq)
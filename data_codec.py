@@ -0,0 +1,42 @@
+"""
+Storage codec for the mind map Data field
+Large maps are stored as zlib-compressed, base64-wrapped JSON behind a
+versioned magic prefix. Plain JSON is still read, so existing notes are
+migrated lazily the next time they are saved.
+"""
+import base64
+import json
+import zlib
+
+# Format version 1: "MMZ1:" + base64(zlib(utf-8 JSON))
+MAGIC = "MMZ1:"
+MAGIC_FAMILY = "MMZ"
+
+# Maps whose JSON is smaller than this are stored as plain JSON
+COMPRESS_THRESHOLD = 16 * 1024
+
+
+def decode_data(raw):
+    """Return the plain JSON string stored in a Data field value"""
+    if not raw:
+        return ""
+    if not raw.startswith(MAGIC_FAMILY):
+        return raw
+    if not raw.startswith(MAGIC):
+        raise ValueError(f"Unsupported mind map data format: {raw[:8]}")
+    payload = base64.b64decode(raw[len(MAGIC):])
+    return zlib.decompress(payload).decode('utf-8')
+
+
+def load_data(raw):
+    """Parse a Data field value into a dict ({} if empty)"""
+    data_json = decode_data(raw)
+    return json.loads(data_json) if data_json else {}
+
+
+def encode_data(data_json):
+    """Encode a plain JSON string for storage in the Data field"""
+    if len(data_json) < COMPRESS_THRESHOLD:
+        return data_json
+    payload = zlib.compress(data_json.encode('utf-8'), 6)
+    return MAGIC + base64.b64encode(payload).decode('ascii')
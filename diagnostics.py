@@ -0,0 +1,157 @@
+"""
+Editor open-time diagnostics
+Each MindMapDialog records how long the phases of its opening took (Python
+steps plus the timings its page reports through pycmd) in a bounded ring
+buffer, shown by Tools > Mind Map > Diagnostics together with the map size.
+"""
+import html
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from aqt import mw
+from aqt.qt import QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QTextEdit, QApplication
+
+MAX_OPENS = 50
+
+# Most recent opens, oldest first
+_opens = deque(maxlen=MAX_OPENS)
+
+# Phases in display order; anything else is listed after them
+PHASES = [
+    ('write_config', "writeConfig"),
+    ('pool', "Pool take"),
+    ('decode', "Decode Data"),
+    ('background', "Background image"),
+    ('build_html', "Build HTML"),
+    ('set_html', "setHtml"),
+    ('page_load', "Page load (JS)"),
+    ('init_editor', "initEditor (JS)"),
+    ('ready', "Until ready"),
+    ('integrity_check', "Link check (bg)"),
+    ('mathjax', "MathJax (JS)"),
+]
+
+
+class OpenTrace:
+    """Phase timings of one editor open, in milliseconds"""
+
+    def __init__(self, note):
+        self._start = time.perf_counter()
+        self.record = {
+            'time': datetime.now(),
+            'map_id': note.id,
+            'title': note['Title'],
+            'data_size': len(note['Data']),
+            'nodes': None,
+            'pooled': False,
+            'phases': {},
+        }
+        _opens.append(self.record)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        self.record['phases'][name] = round(ms, 1)
+
+    def mark(self, name):
+        """Record the time elapsed since the open started"""
+        if name not in self.record['phases']:
+            self.add(name, (time.perf_counter() - self._start) * 1000)
+
+    def add_js(self, stats):
+        """Timings reported by the page (see reportOpenStats in main.js)"""
+        for name, value in stats.items():
+            if name == 'nodes':
+                self.record['nodes'] = int(value)
+            elif isinstance(value, (int, float)):
+                self.add(name, value)
+
+
+def timed(trace, name):
+    """trace.phase(name), or a no-op when there is no trace"""
+    return trace.phase(name) if trace is not None else nullcontext()
+
+
+def recent_opens():
+    return list(reversed(_opens))
+
+
+def _size(num_bytes):
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.1f} MB"
+    if num_bytes >= 1024:
+        return f"{num_bytes / 1024:.1f} KB"
+    return f"{num_bytes} B"
+
+
+def report_html():
+    from .mindmap_editor import save_stats
+    known = [key for key, _ in PHASES]
+    extra = sorted({name for r in _opens for name in r['phases'] if name not in known})
+    columns = PHASES + [(name, name) for name in extra]
+
+    header = "".join(f"<th>{label}</th>" for _, label in columns)
+    rows = []
+    for r in recent_opens():
+        title = html.escape(r['title']) + (" (pooled)" if r['pooled'] else "")
+        cells = "".join(
+            f"<td align='right'>{r['phases'][key]:.0f}</td>" if key in r['phases'] else "<td></td>"
+            for key, _ in columns)
+        nodes = r['nodes'] if r['nodes'] is not None else ""
+        rows.append(f"<tr><td>{r['time']:%H:%M:%S}</td><td>{title}</td><td align='right'>{nodes}</td>"
+                    f"<td align='right'>{_size(r['data_size'])}</td>{cells}</tr>")
+    if not rows:
+        rows.append(f"<tr><td colspan='{len(columns) + 4}'>No maps opened in this session yet.</td></tr>")
+
+    return f"""
+    <h3>Editor opens (last {MAX_OPENS}, times in ms)</h3>
+    <table border="1" cellspacing="0" cellpadding="3">
+    <tr><th>Time</th><th>Map</th><th>Nodes</th><th>Data</th>{header}</tr>
+    {''.join(rows)}
+    </table>
+    <h3>Saves</h3>
+    <p>Written: {save_stats['written']} &nbsp; Skipped (unchanged): {save_stats['skipped']}</p>
+    """
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, mw):
+        super().__init__(mw)
+        self.setWindowTitle("Mind Map Diagnostics")
+        self.resize(1000, 500)
+
+        layout = QVBoxLayout(self)
+        self.report = QTextEdit()
+        self.report.setReadOnly(True)
+        layout.addWidget(self.report)
+
+        btn_layout = QHBoxLayout()
+        btn_refresh = QPushButton("Refresh")
+        btn_refresh.clicked.connect(self.refresh)
+        btn_layout.addWidget(btn_refresh)
+        btn_copy = QPushButton("Copy")
+        btn_copy.clicked.connect(lambda: QApplication.clipboard().setText(self.report.toPlainText()))
+        btn_layout.addWidget(btn_copy)
+        btn_layout.addStretch()
+        btn_close = QPushButton("Close")
+        btn_close.clicked.connect(self.close)
+        btn_layout.addWidget(btn_close)
+        layout.addLayout(btn_layout)
+
+        self.refresh()
+
+    def refresh(self):
+        self.report.setHtml(report_html())
+
+
+def show_diagnostics_dialog():
+    """Show the diagnostics dialog"""
+    dialog = DiagnosticsDialog(mw)
+    dialog.exec()
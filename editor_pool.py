@@ -0,0 +1,86 @@
+"""
+Pre-warmed editor WebView pool (opt-in with the editor_pool config option)
+Keeps one hidden editor page with jsMind and main.js already loaded but no
+map, so opening any map only has to boot the editor with its data.
+The pool refills shortly after each use.
+"""
+from aqt import mw, gui_hooks
+from aqt.qt import QTimer
+from aqt.webview import AnkiWebView
+
+# Config keys baked into the pooled page; a change discards it
+_PAGE_CONFIG_KEYS = ('hotkeys', 'line_color', 'enable_floating_nodes', 'jump_mode',
+                     'background_image', 'background_overlay', 'virtualize_nodes')
+
+REFILL_DELAY_MS = 1500
+
+_web = None
+_ready = False
+_page_config = None
+
+
+def _config():
+    return mw.addonManager.getConfig(__name__) or {}
+
+
+def enabled():
+    return bool(_config().get('editor_pool', False))
+
+
+def _on_pool_bridge_cmd(cmd):
+    global _ready
+    # The hidden page only reports that it finished loading
+    if cmd == "editor_ready":
+        _ready = True
+
+
+def fill():
+    """Create the pooled page if the pool is enabled and empty"""
+    global _web, _ready, _page_config
+    from .mindmap_editor import build_editor_html
+    if _web is not None or not enabled() or not mw.col:
+        return
+    config = _config()
+    _page_config = {key: config.get(key) for key in _PAGE_CONFIG_KEYS}
+    _ready = False
+    _web = AnkiWebView()
+    _web.resize(1024, 768)
+    _web.set_bridge_command(_on_pool_bridge_cmd, _web)
+    # No map yet: the window taking the page starts it with bootEditor(data)
+    _web.setHtml(build_editor_html("null"))
+
+
+def take():
+    """
+    Hand the pooled page to a new editor window
+
+    Returns:
+        AnkiWebView: loaded page waiting for bootEditor(), or None
+    """
+    global _web, _ready
+    if _web is None or not _ready:
+        return None
+    web = _web
+    config = _config()
+    if {key: config.get(key) for key in _PAGE_CONFIG_KEYS} != _page_config:
+        # Page was built with outdated settings
+        discard()
+        QTimer.singleShot(REFILL_DELAY_MS, fill)
+        return None
+    _web, _ready = None, False
+    QTimer.singleShot(REFILL_DELAY_MS, fill)
+    return web
+
+
+def discard():
+    global _web, _ready
+    if _web is not None:
+        if hasattr(_web, 'cleanup'):
+            _web.cleanup()
+        _web.deleteLater()
+    _web, _ready = None, False
+
+
+def init_editor_pool():
+    gui_hooks.profile_did_open.append(lambda: QTimer.singleShot(REFILL_DELAY_MS, fill))
+    gui_hooks.profile_will_close.append(discard)
@@ -2,12 +2,34 @@
 Unified mind map export utility functions
 Avoid duplicating export logic across multiple files
 """
+import gzip
 import json
 import os
+from .data_codec import load_data
 from datetime import datetime
 from aqt.qt import QFileDialog
 from aqt.utils import tooltip
 
+JSON_FILTER = "JSON Files (*.json)"
+GZIP_FILTER = "Compressed JSON Files (*.json.gz)"
+
+
+def copy_viewer(filename):
+    """Copy the standalone viewer next to an exported file; returns its path or None"""
+    try:
+        addon_dir = os.path.dirname(__file__)
+        viewer_source = os.path.join(addon_dir, "web", "standalone_viewer.html")
+        export_dir = os.path.dirname(filename)
+        viewer_dest = os.path.join(export_dir, "MindMap_Viewer.html")
+
+        if os.path.exists(viewer_source):
+            import shutil
+            shutil.copy2(viewer_source, viewer_dest)
+            return viewer_dest
+    except Exception as e:
+        print(f"Failed to copy viewer: {e}")
+    return None
+
 
 def export_mindmap_to_json(parent_widget, mw, note_id, title=None):
     """
@@ -46,7 +68,7 @@ def export_mindmap_to_json(parent_widget, mw, note_id, title=None):
             "export_date": datetime.now().isoformat(),
             "title": title,
             "uuid": uuid_val,
-            "data": json.loads(note['Data']) if note['Data'] else {},
+            "data": load_data(note['Data']),
             "allow_new_cards": allow_new
         }
         
@@ -71,19 +93,7 @@ def export_mindmap_to_json(parent_widget, mw, note_id, title=None):
             json.dump(backup_data, f, ensure_ascii=False, indent=2)
         
         # Copy standalone viewer
-        viewer_path = None
-        try:
-            addon_dir = os.path.dirname(__file__)
-            viewer_source = os.path.join(addon_dir, "web", "standalone_viewer.html")
-            export_dir = os.path.dirname(filename)
-            viewer_dest = os.path.join(export_dir, "MindMap_Viewer.html")
-            
-            if os.path.exists(viewer_source):
-                import shutil
-                shutil.copy2(viewer_source, viewer_dest)
-                viewer_path = viewer_dest
-        except Exception as e:
-            print(f"Failed to copy viewer: {e}")
+        viewer_path = copy_viewer(filename)
         
         return True, filename, viewer_path
         
@@ -94,98 +104,160 @@ def export_mindmap_to_json(parent_widget, mw, note_id, title=None):
         return False, None, None
 
 
-def export_all_mindmaps(parent_widget, mw):
+def _map_entry(note):
+    """Backup entry of one mind map note"""
+    # Get fields (with fallback)
+    try:
+        uuid_val = note['UUID']
+    except KeyError:
+        uuid_val = ''
+
+    try:
+        allow_new = note['AllowNewCards']
+    except KeyError:
+        allow_new = '1'
+
+    return {
+        "title": note['Title'],
+        "uuid": uuid_val,
+        "data": load_data(note['Data']),
+        "allow_new_cards": allow_new,
+        "note_id": note.id
+    }
+
+
+def write_backup(col, ids, f, compact=False, progress=None):
     """
-    Export all mind maps to single JSON file
-    
+    Write the all-maps backup to a text file, one map at a time
+
+    Produces the same document as json.dump of
+    {"export_date", "anki_version", "mindmaps": [...]}, but only one map's
+    parsed data is in memory at any time.
+
     Args:
-        parent_widget: Parent window (for file dialog)
-        mw: Anki main window
-    
+        col: Collection
+        ids: Mind map note IDs
+        f: Text file opened for writing
+        compact: Write without indentation or spaces
+        progress: Optional callable(done, total), called after each map
+
     Returns:
-        tuple: (success: bool, filename: str or None, viewer_path: str or None, count: int)
+        int: Number of maps written
     """
     try:
-        # Find all mind map notes
-        ids = mw.col.find_notes('"note:MindMap Master"')
-        
-        if not ids:
-            return False, None, None, 0
-        
-        # Get Anki version
-        try:
-            anki_ver = str(mw.col.version())
-        except:
-            anki_ver = "unknown"
-        
-        # Collect all mind map data
-        backup_data = {
-            "export_date": datetime.now().isoformat(),
-            "anki_version": anki_ver,
-            "mindmaps": []
-        }
-        
-        for nid in ids:
-            note = mw.col.get_note(nid)
-            
-            # Get fields (with fallback)
-            try:
-                uuid_val = note['UUID']
-            except KeyError:
-                uuid_val = ''
-            
-            try:
-                allow_new = note['AllowNewCards']
-            except KeyError:
-                allow_new = '1'
-            
-            mindmap_info = {
-                "title": note['Title'],
-                "uuid": uuid_val,
-                "data": json.loads(note['Data']) if note['Data'] else {},
-                "allow_new_cards": allow_new,
-                "note_id": nid
-            }
-            backup_data["mindmaps"].append(mindmap_info)
-        
-        # Generate filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        default_filename = f"anki_mindmaps_backup_{timestamp}.json"
-        
-        # Show save dialog
-        filename, _ = QFileDialog.getSaveFileName(
-            parent_widget,
-            "Save Mind Maps Backup",
-            os.path.join(os.path.expanduser("~"), "Documents", default_filename),
-            "JSON Files (*.json)"
-        )
-        
-        if not filename:
-            return False, None, None, 0
-        
-        # Save JSON file
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2)
-        
-        # Copy standalone viewer
-        viewer_path = None
+        anki_ver = str(col.version())
+    except Exception:
+        anki_ver = "unknown"
+
+    if compact:
+        def dump(value, level):
+            return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+        newline, sep, item_sep = "", ":", ","
+    else:
+        def dump(value, level):
+            text = json.dumps(value, ensure_ascii=False, indent=2)
+            return text.replace("\n", "\n" + "  " * level)
+        newline, sep, item_sep = "\n", ": ", ","
+
+    indent = "" if compact else "  "
+    f.write("{" + newline)
+    f.write(f'{indent}"export_date"{sep}{dump(datetime.now().isoformat(), 1)}{item_sep}{newline}')
+    f.write(f'{indent}"anki_version"{sep}{dump(anki_ver, 1)}{item_sep}{newline}')
+    f.write(f'{indent}"mindmaps"{sep}[')
+
+    count = 0
+    for i, nid in enumerate(ids):
         try:
-            addon_dir = os.path.dirname(__file__)
-            viewer_source = os.path.join(addon_dir, "web", "standalone_viewer.html")
-            export_dir = os.path.dirname(filename)
-            viewer_dest = os.path.join(export_dir, "MindMap_Viewer.html")
-            
-            if os.path.exists(viewer_source):
-                import shutil
-                shutil.copy2(viewer_source, viewer_dest)
-                viewer_path = viewer_dest
+            entry = _map_entry(col.get_note(nid))
         except Exception as e:
-            print(f"Failed to copy viewer: {e}")
-        
-        return True, filename, viewer_path, len(ids)
-        
-    except Exception as e:
-        print(f"Export all failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False, None, None, 0
\ No newline at end of file
+            print(f"Skipping mind map {nid} in export: {e}")
+            continue
+        if count:
+            f.write(item_sep)
+        f.write(newline + indent * 2 + dump(entry, 2))
+        count += 1
+        if progress:
+            progress(i + 1, len(ids))
+
+    f.write((newline + indent if count else "") + "]" + newline + "}")
+    return count
+
+
+def _open_output(filename):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'wt', encoding='utf-8')
+    return open(filename, 'w', encoding='utf-8')
+
+
+def export_all_mindmaps(parent_widget, mw, on_done, compact=False):
+    """
+    Export all mind maps to single JSON file in the background
+
+    Maps are read and written one at a time. Choosing a .json.gz file
+    name writes gzip-compressed output.
+
+    Args:
+        parent_widget: Parent window (for file dialog)
+        mw: Anki main window
+        on_done: Called on the main thread with
+            (success: bool, filename: str or None, viewer_path: str or None, count: int);
+            count is 0 if there are no mind maps, -1 if cancelled or failed
+        compact: Write JSON without indentation
+    """
+    from aqt.operations import QueryOp
+
+    # Find all mind map notes
+    ids = mw.col.find_notes('"note:MindMap Master"')
+
+    if not ids:
+        on_done(False, None, None, 0)
+        return
+
+    # Generate filename
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    default_filename = f"anki_mindmaps_backup_{timestamp}.json"
+
+    # Show save dialog
+    filename, selected_filter = QFileDialog.getSaveFileName(
+        parent_widget,
+        "Save Mind Maps Backup",
+        os.path.join(os.path.expanduser("~"), "Documents", default_filename),
+        f"{JSON_FILTER};;{GZIP_FILTER}"
+    )
+
+    if not filename:
+        on_done(False, None, None, -1)
+        return
+    if selected_filter == GZIP_FILTER and not filename.endswith('.gz'):
+        filename += '.gz'
+
+    def on_progress(done, total):
+        mw.taskman.run_on_main(
+            lambda: mw.progress.update(label=f"Exporting mind maps... {done}/{total}", value=done, max=total))
+
+    def op(col):
+        # Write next to the target and move into place, so a failed export never leaves half a backup
+        partial = filename + '.part'
+        try:
+            with _open_output(partial) as f:
+                count = write_backup(col, ids, f, compact, on_progress)
+            os.replace(partial, filename)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return count
+
+    def on_success(count):
+        on_done(True, filename, copy_viewer(filename), count)
+
+    def on_failure(exc):
+        print(f"Export all failed: {exc}")
+        tooltip(f"Export failed: {exc}")
+        on_done(False, None, None, -1)
+
+    QueryOp(
+        parent=parent_widget,
+        op=op,
+        success=on_success,
+    ).failure(on_failure).with_progress("Exporting mind maps...").run_in_background()
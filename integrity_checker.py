@@ -0,0 +1,220 @@
+"""
+Background link integrity checker
+Finds card links to nodes that no longer exist and nodes whose card was
+deleted or no longer links back, then fixes both sides in one batched write.
+Each map keeps a "last verified" watermark (see link_index.py), so a check
+only loads cards modified since then; editors open on the stored data
+right away and the check runs once the page is up.
+"""
+import json
+import time
+from aqt import mw
+from anki.collection import OpChanges
+from . import link_encoding
+from . import link_index
+from . import map_stats
+from . import node_index
+
+# Map ids with a check in flight or queued behind one
+_running = set()
+_queued = set()
+
+
+def _open_editor(mindmap_id):
+    for editor in getattr(mw, 'mindmap_editors', []):
+        if editor.note_id == mindmap_id:
+            return editor
+    return None
+
+
+def _note_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _check(col, mindmap_id, watermark, editor_open, map_data):
+    """
+    Find and fix broken links of one map (runs in the background)
+
+    Map fixes are only written when no editor has the map open; otherwise
+    they are returned for the editor to apply. The data of a map that is
+    to be written is stored in map_data.
+
+    Returns:
+        tuple: (notes to write, node ids to unlink in the open editor)
+    """
+    try:
+        mindmap_note = col.get_note(mindmap_id)
+    except Exception:
+        return [], []
+    index = node_index.get_index(mindmap_note)
+    if not index.data:
+        return [], []
+
+    links = link_index.cards_for_map(mindmap_id, col)
+    node_cards = {}
+    for node_id, node in index.nodes.items():
+        note_id = _note_id(node.get('noteId'))
+        if note_id:
+            node_cards[node_id] = note_id
+
+    # One query for existence and mod time of every card either side refers to
+    card_ids = {nid for nid, _ in links} | set(node_cards.values())
+    mods = dict(col.db.all(
+        f"select id, mod from notes where id in ({','.join(str(n) for n in card_ids)})")) if card_ids else {}
+    deleted = card_ids - mods.keys()
+    changed = {nid for nid, mod in mods.items() if watermark is None or mod >= watermark}
+    map_changed = watermark is None or mindmap_note.mod >= watermark
+
+    # Links of cards deleted outside this profile's hooks (e.g. by a sync)
+    stale = [nid for nid, _ in links if nid in deleted]
+    if stale:
+        link_index.remove_links(stale)
+
+    notes = []
+    # Part 1: cards linked to nodes that no longer exist. Nodes only disappear
+    # when the map changes; cards only relink when they change.
+    for nid, node_id in links:
+        if nid in deleted or node_id in index.nodes or not (map_changed or nid in changed):
+            continue
+        try:
+            card_note = col.get_note(nid)
+        except Exception:
+            continue
+        orphaned = {link_node for mid, link_node, _ in link_encoding.iter_links(card_note)
+                    if mid == mindmap_id and link_node not in index.nodes}
+        if orphaned and link_encoding.remove_links(card_note, mindmap_id, orphaned):
+            print(f"Removing orphaned links to nodes {sorted(orphaned)} from card {nid}")
+            notes.append(card_note)
+
+    # Part 2: nodes whose card was deleted or no longer links back
+    unlinked = []
+    for node_id, note_id in node_cards.items():
+        if note_id in deleted:
+            unlinked.append(node_id)
+        elif note_id in changed:
+            try:
+                card_note = col.get_note(note_id)
+            except Exception:
+                continue
+            if not any(mid == mindmap_id for mid, _, _ in link_encoding.iter_links(card_note)):
+                unlinked.append(node_id)
+
+    if unlinked and not editor_open:
+        from .static_renderer import store_map_data
+        index = node_index.take(mindmap_note)
+        for node_id in unlinked:
+            node = index.get(node_id)
+            if node is not None and 'noteId' in node:
+                del node['noteId']
+        store_map_data(mindmap_note, index.data)
+        notes.append(mindmap_note)
+        map_data[mindmap_id] = index.data
+
+    if notes or unlinked:
+        print(f"Integrity check of map {mindmap_id}: {len(notes)} notes fixed, {len(unlinked)} node links removed")
+    return notes, (unlinked if editor_open else [])
+
+
+def _run(col, mindmap_ids, editor_maps, result):
+    """Check maps and write every fix in one update_notes call"""
+    from .card_linker import suppress_card_sync
+    notes = []
+    map_data = {}
+    for mindmap_id in mindmap_ids:
+        watermark = link_index.verified_watermark(mindmap_id)
+        latest = col.db.scalar("select max(mod) from notes") or 0
+        # Watermark from a collection that has since been replaced (full sync or restore)
+        if watermark is not None and watermark > latest:
+            watermark = None
+        map_notes, unlinked = _check(col, mindmap_id, watermark, mindmap_id in editor_maps, map_data)
+        notes.extend(map_notes)
+        if unlinked:
+            result[mindmap_id] = unlinked
+        result.setdefault('verified', []).append((mindmap_id, latest))
+    if not notes:
+        return OpChanges()
+    with suppress_card_sync([n.id for n in notes]):
+        changes = col.update_notes(notes)
+    for note in notes:
+        if note.id in map_data:
+            node_index.invalidate(note.id)
+            map_stats.record_map(col, note, map_data[note.id])
+    return changes
+
+
+def check_maps(mindmap_ids, on_done=None):
+    """
+    Verify the links of these maps in the background
+
+    on_done, if given, is called with the elapsed milliseconds once the check finishes.
+    """
+    from aqt.operations import CollectionOp
+    _queued.update(mid for mid in mindmap_ids if mid in _running)
+    mindmap_ids = [mid for mid in mindmap_ids if mid not in _running]
+    if not mindmap_ids or not mw.col:
+        return
+    _running.update(mindmap_ids)
+    editor_maps = {mid for mid in mindmap_ids if _open_editor(mid)}
+    result = {}
+    start = time.perf_counter()
+
+    def finish():
+        if on_done:
+            on_done((time.perf_counter() - start) * 1000)
+        _running.difference_update(mindmap_ids)
+        again = [mid for mid in mindmap_ids if mid in _queued]
+        _queued.difference_update(again)
+        if again:
+            check_maps(again)
+
+    def on_success(changes):
+        for mindmap_id, watermark in result.get('verified', []):
+            unlinked = result.get(mindmap_id)
+            if not unlinked:
+                link_index.set_verified_watermark(mindmap_id, watermark)
+                continue
+            editor = _open_editor(mindmap_id)
+            if editor is not None:
+                # The editor saves the change like any other edit
+                editor.web.eval(f"unlinkNodes({json.dumps(unlinked)});")
+                link_index.set_verified_watermark(mindmap_id, watermark)
+            else:
+                # Editor closed meanwhile: leave the watermark so the map is fixed next time
+                _queued.add(mindmap_id)
+        finish()
+
+    def on_failure(exc):
+        print(f"Integrity check failed: {exc}")
+        finish()
+
+    CollectionOp(
+        parent=mw,
+        op=lambda col: _run(col, mindmap_ids, editor_maps, result),
+    ).success(on_success).failure(on_failure).run_in_background()
+
+
+def check_map(mindmap_id, on_done=None):
+    check_maps([mindmap_id], on_done)
+
+
+def check_all():
+    """Verify every map, e.g. after a sync brought in changes"""
+    from .note_manager import MODEL_NAME
+    if not mw.col:
+        return
+    model = mw.col.models.by_name(MODEL_NAME)
+    if model:
+        check_maps(mw.col.db.list("select id from notes where mid = ?", model['id']))
+
+
+def on_sync_did_finish():
+    # Index the links a sync brought in first, then verify every map against it
+    link_index.refresh_in_background(on_done=check_all)
+
+
+def init_integrity_checker():
+    from aqt import gui_hooks
+    gui_hooks.sync_did_finish.append(on_sync_did_finish)
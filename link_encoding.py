@@ -0,0 +1,264 @@
+"""
+Card -> mind map link encodings
+A link is stored either as a hidden <div id="mindmap-link"> appended to a card
+field ("div", the original format) or as a hierarchical tag
+mindmap::<map uuid>::<node id> ("tag"), which Anki indexes for search and
+field edits cannot mangle. Both are always read; the link_encoding config
+option picks the one new links are written with.
+"""
+import re
+from aqt import mw
+
+TAG_PREFIX = "mindmap::"
+DIV_PATTERN = re.compile(r'id="mindmap-link"\s+data-mid="(\d+)"\s+data-nid="([^"]+)"')
+_DIV_BLOCK_PATTERN = re.compile(r'<div[^>]*id="mindmap-link"[^>]*>.*?</div>\s*', re.DOTALL | re.IGNORECASE)
+
+# Map UUID -> map note id, reloaded when a UUID is not found and the maps changed
+_map_ids = {}
+_map_ids_key = None
+
+# Characters read from the end of flds; enough for the UUID and the fields after it
+_UUID_TAIL = 128
+
+
+def _maps_key(col, model):
+    """Changes whenever the notetype or any map note does (like map_catalog's cache key)"""
+    count, last_mod = col.db.first("select count(), max(mod) from notes where mid = ?", model['id'])
+    return col.path, model['id'], model.get('mod'), count, last_mod
+
+
+def _uuid_from_tail(tail, after):
+    """UUID field from the end of flds, or None if the tail is too short to contain it whole"""
+    parts = tail.split('\x1f')
+    if len(parts) < after + 2:
+        return None
+    return parts[-(after + 1)]
+
+
+def _load_map_ids(col, model, key):
+    global _map_ids, _map_ids_key
+    names = [f['name'] for f in model['flds']]
+    map_ids = {}
+    if 'UUID' in names:
+        uuid_ord = names.index('UUID')
+        after = len(names) - 1 - uuid_ord
+        # Only the end of flds, so the maps' Data is never read into Python
+        for nid, tail in col.db.execute(f"select id, substr(flds, -{_UUID_TAIL}) from notes where mid = ?", model['id']):
+            map_uuid = _uuid_from_tail(tail, after)
+            if map_uuid is None:
+                fields = col.db.scalar("select flds from notes where id = ?", nid).split('\x1f')
+                map_uuid = fields[uuid_ord] if uuid_ord < len(fields) else ""
+            if map_uuid:
+                map_ids[map_uuid.strip().lower()] = nid
+    # One assignment: readers on other threads see the old or the new dict, never a partial one
+    _map_ids = map_ids
+    _map_ids_key = key
+
+
+def map_id_for_uuid(map_uuid, col=None):
+    from .note_manager import MODEL_NAME
+    map_uuid = map_uuid.lower()
+    map_ids = _map_ids
+    if map_uuid not in map_ids:
+        col = col or mw.col
+        model = col.models.by_name(MODEL_NAME)
+        if not model:
+            return None
+        key = _maps_key(col, model)
+        # Unknown UUIDs (e.g. tags of deleted maps) only reload after the maps changed
+        if key == _map_ids_key:
+            return None
+        _load_map_ids(col, model, key)
+        map_ids = _map_ids
+    return map_ids.get(map_uuid)
+
+
+def map_uuid_for_id(mindmap_id, col=None):
+    try:
+        map_uuid = (col or mw.col).get_note(mindmap_id)['UUID'].strip().lower()
+    except Exception:
+        return None
+    if map_uuid:
+        _map_ids[map_uuid] = mindmap_id
+    return map_uuid or None
+
+
+def link_tag(map_uuid, node_id):
+    return f"{TAG_PREFIX}{map_uuid}::{node_id}"
+
+
+def parse_tag(tag, col=None):
+    """(mindmap_id, node_id) for a link tag, or None"""
+    if not tag.lower().startswith(TAG_PREFIX):
+        return None
+    parts = tag.split('::', 2)
+    if len(parts) != 3 or not parts[2]:
+        return None
+    mindmap_id = map_id_for_uuid(parts[1], col)
+    return (mindmap_id, parts[2]) if mindmap_id else None
+
+
+def iter_links(note):
+    """Yield (mindmap_id, node_id, field_name) for every link; field_name is None for tags"""
+    for field_name, field_content in zip(note.keys(), note.fields):
+        if 'mindmap-link' in field_content:
+            for match in DIV_PATTERN.finditer(field_content):
+                yield int(match.group(1)), match.group(2), field_name
+    for tag in note.tags:
+        link = parse_tag(tag)
+        if link:
+            yield link[0], link[1], None
+
+
+def read_link(note):
+    """First (mindmap_id, node_id, field_name) link of a note, or None"""
+    return next(iter_links(note), None)
+
+
+def parse_raw(flds, tags, col=None):
+    """(mindmap_id, node_id) from raw notes.flds / notes.tags columns, or None"""
+    if 'mindmap-link' in flds:
+        match = DIV_PATTERN.search(flds)
+        if match:
+            return int(match.group(1)), match.group(2)
+    if TAG_PREFIX in tags.lower():
+        for tag in tags.split():
+            link = parse_tag(tag, col)
+            if link:
+                return link
+    return None
+
+
+def _link_field(note):
+    """Field a hidden link div is appended to"""
+    if 'Back' in note:
+        return 'Back'
+    if 'Back Extra' in note:
+        return 'Back Extra'
+    if 'Extra' in note:
+        return 'Extra'
+    if len(note.fields) > 1:
+        # Fallback to the last field if it's not the first one
+        return list(note.keys())[-1]
+    return None
+
+
+def link_div(mindmap_id, node_id):
+    return f"""
+<div id="mindmap-link"
+     data-mid="{mindmap_id}"
+     data-nid="{node_id}"
+     style="display:none;">
+</div>
+"""
+
+
+def add_link(note, mindmap_id, node_id, encoding=None):
+    """
+    Store a link on the note (in memory) using the configured encoding
+
+    Returns:
+        bool: True if the note was changed and needs to be written
+    """
+    if (encoding or link_encoding()) == 'tag':
+        map_uuid = map_uuid_for_id(mindmap_id)
+        if map_uuid:
+            note.add_tag(link_tag(map_uuid, node_id))
+            return True
+        # Maps without a UUID can only be linked with a div
+    field_name = _link_field(note)
+    if not field_name:
+        return False
+    note[field_name] += link_div(mindmap_id, node_id)
+    return True
+
+
+def remove_links(note, mindmap_id=None, node_ids=None, tags=True):
+    """
+    Remove link divs and tags from the note (in memory)
+
+    Only links to `mindmap_id` / `node_ids` are removed when given, and
+    only divs when `tags` is False.
+
+    Returns:
+        bool: True if the note was changed
+    """
+    def matches(mid, nid):
+        return (mindmap_id is None or mid == mindmap_id) and (node_ids is None or nid in node_ids)
+
+    def remove_div(match):
+        link = DIV_PATTERN.search(match.group(0))
+        if link and not matches(int(link.group(1)), link.group(2)):
+            return match.group(0)
+        return ""
+
+    modified = False
+    for field_name, field_content in zip(note.keys(), list(note.fields)):
+        if 'mindmap-link' not in field_content:
+            continue
+        new_content = _DIV_BLOCK_PATTERN.sub(remove_div, field_content)
+        if new_content != field_content:
+            note[field_name] = new_content
+            modified = True
+
+    if not tags:
+        return modified
+    for tag in list(note.tags):
+        link = parse_tag(tag)
+        # Tags of deleted maps are always dropped
+        if (link and matches(*link)) or (not link and mindmap_id is None and tag.lower().startswith(TAG_PREFIX)):
+            note.remove_tag(tag)
+            modified = True
+    return modified
+
+
+def migrate_to_tags(col):
+    """
+    Convert every hidden link div in the collection to a link tag
+
+    Returns:
+        tuple: (OpChanges, number of converted notes)
+    """
+    from .card_linker import suppress_card_sync
+    notes = []
+    for nid in col.db.list("select id from notes where flds like '%mindmap-link%'"):
+        note = col.get_note(nid)
+        converted = set()
+        for mindmap_id, node_id, field_name in list(iter_links(note)):
+            if field_name is None:
+                continue
+            map_uuid = map_uuid_for_id(mindmap_id, col)
+            if map_uuid:
+                note.add_tag(link_tag(map_uuid, node_id))
+                converted.add((mindmap_id, node_id))
+        # Divs of deleted maps are left alone; the tags just added stay
+        for mindmap_id, node_id in converted:
+            remove_links(note, mindmap_id, {node_id}, tags=False)
+        if converted:
+            notes.append(note)
+    with suppress_card_sync([n.id for n in notes]):
+        changes = col.update_notes(notes)
+    return changes, len(notes)
+
+
+def on_migrate_action():
+    """Menu action: convert hidden link divs to tags and switch new links to tags"""
+    from aqt.operations import CollectionOp
+    from aqt.utils import askUser, tooltip
+    if not askUser("Convert all mind map links stored as hidden divs in card fields to "
+                   "mindmap::<map>::<node> tags?\n\nNew links will also be stored as tags."):
+        return
+
+    result = {}
+
+    def op(col):
+        changes, result['count'] = migrate_to_tags(col)
+        return changes
+
+    def on_success(changes):
+        config = mw.addonManager.getConfig(__name__) or {}
+        config['link_encoding'] = 'tag'
+        mw.addonManager.writeConfig(__name__, config)
+        tooltip(f"Converted links on {result.get('count', 0)} cards to tags")
+
+    CollectionOp(parent=mw, op=op).success(on_success).run_in_background()
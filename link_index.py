@@ -0,0 +1,258 @@
+"""
+Reverse link index: card note id -> (mind map id, node id)
+Kept in a small SQLite file per profile under user_files so finding the cards
+of a map no longer needs a full-text search of every note. The index is a
+cache; it can always be rebuilt from the link divs and tags on the cards.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from aqt import mw
+from .link_encoding import parse_raw, read_link
+
+_conn = None
+_lock = threading.RLock()
+
+
+def _db_path():
+    folder = os.path.join(os.path.dirname(__file__), "user_files")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"link_index_{mw.pm.name}.sqlite")
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(_db_path(), check_same_thread=False)
+        # Rebuildable cache: favour speed over durability
+        _conn.execute("pragma journal_mode=wal")
+        _conn.execute("pragma synchronous=off")
+        _conn.execute("create table if not exists links (card_nid integer primary key, mindmap_id integer not null, node_id text not null)")
+        _conn.execute("create index if not exists ix_links_mindmap on links (mindmap_id)")
+        _conn.execute("create table if not exists meta (key text primary key, value integer)")
+        # Per-map watermark of the background integrity checker
+        _conn.execute("create table if not exists verified (mindmap_id integer primary key, watermark integer not null)")
+        # Per-map figures for the manager (see map_stats.py)
+        _conn.execute("create table if not exists map_stats (mindmap_id integer primary key, nodes integer, floating integer, data_size integer, mod integer)")
+    return _conn
+
+
+def _get_meta(key):
+    row = _db().execute("select value from meta where key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_meta(key, value):
+    _db().execute("insert or replace into meta (key, value) values (?, ?)", (key, value))
+
+
+@contextmanager
+def database():
+    """The add-on's cache database, locked for the block and committed after it"""
+    with _lock:
+        db = _db()
+        yield db
+        db.commit()
+
+
+def close():
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+def set_link(card_nid, mindmap_id, node_id):
+    with _lock:
+        db = _db()
+        db.execute("insert or replace into links (card_nid, mindmap_id, node_id) values (?, ?, ?)",
+                   (card_nid, mindmap_id, node_id))
+        db.commit()
+
+
+def remove_links(card_nids):
+    with _lock:
+        db = _db()
+        db.executemany("delete from links where card_nid = ?", [(nid,) for nid in card_nids])
+        db.commit()
+
+
+def update_from_note(note):
+    """Record or drop the link of a note that is about to be written"""
+    if not note.id:
+        return
+    link = read_link(note)
+    # Runs for every note written; most have no link and no row, so nothing is written
+    with _lock:
+        row = _db().execute("select mindmap_id, node_id from links where card_nid = ?", (note.id,)).fetchone()
+    if link and row != (link[0], link[1]):
+        set_link(note.id, link[0], link[1])
+    elif not link and row:
+        remove_links([note.id])
+
+
+def link_counts():
+    """mindmap_id -> number of linked cards, or None until the index is built (see ensure_built)"""
+    if not is_built():
+        return None
+    with _lock:
+        return dict(_db().execute("select mindmap_id, count() from links group by mindmap_id"))
+
+
+def cards_for_map(mindmap_id, col=None):
+    """(card note id, node id) pairs of the cards linked to a mind map"""
+    ensure_built(col)
+    with _lock:
+        return _db().execute(
+            "select card_nid, node_id from links where mindmap_id = ?", (mindmap_id,)).fetchall()
+
+
+def verified_watermark(mindmap_id):
+    """Collection mod time up to which a map's links were last verified, or None"""
+    with _lock:
+        row = _db().execute("select watermark from verified where mindmap_id = ?", (mindmap_id,)).fetchone()
+    return row[0] if row else None
+
+
+def set_verified_watermark(mindmap_id, watermark):
+    with _lock:
+        db = _db()
+        db.execute("insert or replace into verified (mindmap_id, watermark) values (?, ?)", (mindmap_id, watermark))
+        db.commit()
+
+
+def _scan(col, since=None):
+    """
+    Links of notes modified at or after `since` (all notes if None)
+
+    Returns:
+        tuple: ([(card_nid, mindmap_id, node_id)], [ids whose link could not be resolved])
+    """
+    sql = "select id, flds, tags from notes where (flds like '%mindmap-link%' or tags like '%mindmap::%')"
+    args = ()
+    if since is not None:
+        sql += " and mod >= ?"
+        args = (since,)
+    rows = []
+    unresolved = []
+    for nid, flds, tags in col.db.execute(sql, *args):
+        link = parse_raw(flds, tags, col)
+        if link:
+            rows.append((nid, link[0], link[1]))
+        else:
+            unresolved.append(nid)
+    return rows, unresolved
+
+
+def rebuild(col):
+    """Rebuild the whole index from the link divs and tags; returns the link count"""
+    watermark = col.db.scalar("select max(mod) from notes") or 0
+    rows, _ = _scan(col)
+    with _lock:
+        db = _db()
+        db.execute("delete from links")
+        db.executemany("insert or replace into links (card_nid, mindmap_id, node_id) values (?, ?, ?)", rows)
+        _set_meta('watermark', watermark)
+        db.commit()
+    print(f"Rebuilt mind map link index: {len(rows)} links")
+    return len(rows)
+
+
+def refresh(col):
+    """Pick up notes changed outside this add-on (e.g. by a sync) since the last scan"""
+    with _lock:
+        watermark = _get_meta('watermark')
+    if watermark is None:
+        return rebuild(col)
+    new_watermark = col.db.scalar("select max(mod) from notes") or 0
+    if new_watermark < watermark:
+        # Collection was replaced (full sync or restore)
+        return rebuild(col)
+    changed, unresolved = _scan(col, watermark)
+    unlinked = col.db.list(
+        "select id from notes where mod >= ? and flds not like '%mindmap-link%' and tags not like '%mindmap::%'",
+        watermark) + unresolved
+    # Links to deleted notes are dropped when the cards of a map are checked
+    with _lock:
+        db = _db()
+        db.executemany("delete from links where card_nid = ?", [(nid,) for nid in unlinked])
+        db.executemany("insert or replace into links (card_nid, mindmap_id, node_id) values (?, ?, ?)", changed)
+        _set_meta('watermark', new_watermark)
+        db.commit()
+    return len(changed)
+
+
+def is_built():
+    with _lock:
+        return _get_meta('watermark') is not None
+
+
+def ensure_built(col=None):
+    """Build the index if it was never built; a full scan, so call it in the background"""
+    if not is_built():
+        rebuild(col or mw.col)
+
+
+def refresh_in_background(on_done=None):
+    """refresh() in a background operation; on_done is called afterwards, also on failure"""
+    from aqt.operations import QueryOp
+    if not mw.col:
+        return
+
+    def finish(_=None):
+        if on_done:
+            on_done()
+
+    def on_failure(exc):
+        print(f"Link index refresh failed: {exc}")
+        finish()
+
+    QueryOp(
+        parent=mw,
+        op=lambda col: refresh(col),
+        success=finish,
+    ).failure(on_failure).run_in_background()
+
+
+def on_notes_will_be_deleted(col, ids):
+    remove_links(ids)
+
+
+def on_undo(changes):
+    """
+    Undo and redo restore notes without note_will_flush and with their old
+    mod time, so refresh() would miss them; rebuild when notes were touched
+    """
+    from aqt.operations import QueryOp
+    if not getattr(changes, 'changes', changes).note or not mw.col:
+        return
+    QueryOp(
+        parent=mw,
+        op=lambda col: rebuild(col),
+        success=lambda _: None,
+    ).failure(lambda exc: print(f"Link index rebuild after undo failed: {exc}")).run_in_background()
+
+
+def on_rebuild_action():
+    """Menu action: rebuild the index in the background"""
+    from aqt.operations import QueryOp
+    from aqt.utils import tooltip
+    QueryOp(
+        parent=mw,
+        op=lambda col: rebuild(col),
+        success=lambda count: tooltip(f"Link index rebuilt: {count} linked cards"),
+    ).with_progress("Rebuilding mind map link index...").run_in_background()
+
+
+def init_link_index():
+    from anki import hooks
+    from aqt import gui_hooks
+    hooks.note_will_flush.append(update_from_note)
+    hooks.notes_will_be_deleted.append(on_notes_will_be_deleted)
+    gui_hooks.profile_will_close.append(close)
+    gui_hooks.state_did_undo.append(on_undo)
+    if hasattr(gui_hooks, 'state_did_redo'):
+        gui_hooks.state_did_redo.append(on_undo)
+    # Refreshed after a sync by integrity_checker, before it checks the maps
@@ -0,0 +1,85 @@
+"""
+Lightweight catalog of all mind maps (id, title, active flag, mod time)
+Read with one query that never sends the Data field to Python, and cached
+until the MindMap Master notetype or any of its notes changes.
+"""
+from collections import namedtuple
+from aqt import mw
+
+MapInfo = namedtuple('MapInfo', 'id title allow_new mod')
+
+# Shown for maps whose Title field is empty
+UNTITLED = "(Untitled map)"
+
+# Characters read from the end of flds; enough to find the AllowNewCards value
+_TAIL = 8
+
+_cache_key = None
+_cache = []
+
+
+def _fields_query(model):
+    """SQL selecting (id, mod, title, tail) if Title and AllowNewCards sit where SQL can cut them out cheaply"""
+    names = [f['name'] for f in model['flds']]
+    if not names or names[0] != 'Title':
+        return None
+    if 'AllowNewCards' in names and names[-1] != 'AllowNewCards':
+        return None
+    # Title is the first field, AllowNewCards (if present) the last one
+    title = "case when instr(flds, char(31)) > 0 then substr(flds, 1, instr(flds, char(31)) - 1) else flds end"
+    tail = f"substr(flds, -{_TAIL})" if 'AllowNewCards' in names else "null"
+    return f"select id, mod, {title}, {tail} from notes where mid = ? order by id"
+
+
+def _allow_from_tail(tail):
+    if tail is None:
+        # Field missing: maps are active by default
+        return True
+    _, sep, value = tail.rpartition('\x1f')
+    # No separator: the value is longer than the tail, so it is not "1"
+    return bool(sep) and value == "1"
+
+
+def _load(col, model):
+    query = _fields_query(model)
+    if query:
+        return [MapInfo(nid, title, _allow_from_tail(tail), mod)
+                for nid, mod, title, tail in col.db.execute(query, model['id'])]
+
+    # Unusual field layout: split the fields in Python, still in one round trip
+    names = [f['name'] for f in model['flds']]
+    title_ord = names.index('Title') if 'Title' in names else 0
+    allow_ord = names.index('AllowNewCards') if 'AllowNewCards' in names else None
+    maps = []
+    for nid, mod, flds in col.db.execute("select id, mod, flds from notes where mid = ? order by id", model['id']):
+        fields = flds.split('\x1f')
+        title = fields[title_ord] if title_ord < len(fields) else ""
+        allow = allow_ord is None or allow_ord >= len(fields) or fields[allow_ord] == "1"
+        maps.append(MapInfo(nid, title, allow, mod))
+    return maps
+
+
+def list_maps(col=None):
+    """All mind maps as MapInfo(id, title, allow_new, mod), oldest first"""
+    global _cache_key, _cache
+    from .note_manager import MODEL_NAME
+    col = col or mw.col
+    model = col.models.by_name(MODEL_NAME)
+    if not model:
+        return []
+    count, last_mod = col.db.first("select count(), max(mod) from notes where mid = ?", model['id'])
+    key = (col.path, model['id'], model.get('mod'), model.get('usn'), count, last_mod)
+    if key != _cache_key:
+        _cache = _load(col, model)
+        _cache_key = key
+    return list(_cache)
+
+
+def display_title(title):
+    """Title as shown in lists and badges, with a placeholder for empty titles"""
+    return title.strip() or UNTITLED
+
+
+def invalidate():
+    global _cache_key
+    _cache_key = None
@@ -0,0 +1,164 @@
+"""
+Searchable mind map picker for the editor's MM button
+A popup with a filter box over a QListView backed by the map catalog.
+The list view only creates the rows that are visible, and filtering runs
+on the cached titles, so the picker opens quickly with hundreds of maps.
+Recently picked maps are listed first.
+"""
+from aqt import mw
+from aqt.qt import *
+from .map_catalog import display_title
+
+MAX_RECENT = 10
+
+# Row id for the "No association" entry
+CLEAR = 0
+
+
+def recent_map_ids():
+    config = mw.addonManager.getConfig(__name__) or {}
+    return config.get('recent_mindmaps', [])
+
+
+def remember_map(mindmap_id):
+    """Move a map to the front of the recently used list"""
+    config = mw.addonManager.getConfig(__name__) or {}
+    recent = [mid for mid in config.get('recent_mindmaps', []) if mid != mindmap_id]
+    config['recent_mindmaps'] = [mindmap_id] + recent[:MAX_RECENT - 1]
+    mw.addonManager.writeConfig(__name__, config)
+
+
+def match_score(query, title):
+    """
+    How well a title matches the filter text; None if it does not match
+
+    Lower is better: prefix, then word prefix, then substring, then fuzzy
+    (all query characters in order).
+    """
+    if not query:
+        return 0
+    title = title.lower()
+    if title.startswith(query):
+        return 0
+    if any(word.startswith(query) for word in title.split()):
+        return 1
+    if query in title:
+        return 2
+    pos = 0
+    for char in query:
+        pos = title.find(char, pos) + 1
+        if not pos:
+            return None
+    return 3
+
+
+class MapListModel(QAbstractListModel):
+    """Filtered list of (map id, title) rows"""
+
+    def __init__(self, maps, recent, parent=None):
+        super().__init__(parent)
+        # Recently used first, in order of use; then catalog order
+        rank = {mid: i for i, mid in enumerate(recent)}
+        self._maps = sorted(maps, key=lambda m: rank.get(m.id, len(rank)))
+        self._recent = set(rank)
+        self._rows = []
+        self.set_filter("")
+
+    def set_filter(self, text):
+        query = text.strip().lower()
+        scored = []
+        for order, info in enumerate(self._maps):
+            score = match_score(query, info.title)
+            if score is not None:
+                scored.append((score, order, info))
+        # Stable within a score, so recent maps stay first
+        scored.sort(key=lambda item: item[:2])
+        self.beginResetModel()
+        self._rows = [(info.id, display_title(info.title)) for _, _, info in scored]
+        if not query:
+            self._rows.insert(0, (CLEAR, "❌ No association"))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        mid, title = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"🕘 {title}" if mid in self._recent else title
+        if role == Qt.ItemDataRole.UserRole:
+            return mid
+        return None
+
+
+class MapPicker(QDialog):
+    """Popup returning the picked map id, CLEAR for no association, or None"""
+
+    def __init__(self, maps, parent=None):
+        super().__init__(parent, Qt.WindowType.Popup)
+        self.selected = None
+        self.resize(360, 420)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Type to filter mind maps...")
+        layout.addWidget(self.filter_edit)
+
+        self.model = MapListModel(maps, recent_map_ids(), self)
+        self.view = QListView()
+        # Fixed row height: the view lays out and paints only the visible rows
+        self.view.setUniformItemSizes(True)
+        self.view.setModel(self.model)
+        self.view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.view)
+
+        self.filter_edit.textChanged.connect(self._on_filter)
+        self.filter_edit.returnPressed.connect(self._accept_current)
+        self.view.activated.connect(self._accept_index)
+        self.filter_edit.installEventFilter(self)
+        self._select_first()
+
+    def _select_first(self):
+        # Skip the "No association" row so Enter picks the first map
+        row = 1 if not self.filter_edit.text().strip() and self.model.rowCount() > 1 else 0
+        if self.model.rowCount():
+            self.view.setCurrentIndex(self.model.index(row))
+
+    def _on_filter(self, text):
+        self.model.set_filter(text)
+        self._select_first()
+
+    def _accept_index(self, index):
+        if index.isValid():
+            self.selected = index.data(Qt.ItemDataRole.UserRole)
+            self.accept()
+
+    def _accept_current(self):
+        self._accept_index(self.view.currentIndex())
+
+    def eventFilter(self, obj, event):
+        # Arrow keys in the filter box move the list selection
+        if obj is self.filter_edit and event.type() == QEvent.Type.KeyPress:
+            if event.key() in (Qt.Key.Key_Up, Qt.Key.Key_Down, Qt.Key.Key_PageUp, Qt.Key.Key_PageDown):
+                QApplication.sendEvent(self.view, event)
+                return True
+        return super().eventFilter(obj, event)
+
+
+def pick_map(maps, parent=None):
+    """
+    Show the picker at the cursor
+
+    Returns:
+        int: picked map id, CLEAR for "No association", or None if dismissed
+    """
+    picker = MapPicker(maps, parent)
+    picker.move(QCursor.pos())
+    picker.filter_edit.setFocus()
+    picker.exec()
+    if picker.selected not in (None, CLEAR):
+        remember_map(picker.selected)
+    return picker.selected
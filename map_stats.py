@@ -0,0 +1,66 @@
+"""
+Per-map statistics for the Mind Map Manager
+Node and floating node counts and the Data size are recorded whenever the
+add-on writes a map (editor saves, card linking, link checks) and kept in the
+add-on's cache database, so listing maps never parses their JSON. Linked card
+counts come from the link index; maps changed elsewhere (e.g. by a sync) are
+re-measured in the background.
+"""
+from . import link_index
+
+_MOD_SQL = "select mod from notes where id = ?"
+
+
+def count_nodes(data):
+    """(tree nodes, floating nodes) of parsed map data"""
+    nodes = 0
+    stack = [data.get('data')] if isinstance(data.get('data'), dict) else []
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        stack.extend(child for child in node.get('children') or [] if isinstance(child, dict))
+    floating = sum(1 for n in data.get('floatingNodes') or [] if isinstance(n, dict))
+    return nodes, floating
+
+
+def record(col, mindmap_id, nodes, floating, data_size):
+    """Store the figures of a map that was just written"""
+    mod = col.db.scalar(_MOD_SQL, mindmap_id)
+    with link_index.database() as db:
+        db.execute("insert or replace into map_stats (mindmap_id, nodes, floating, data_size, mod) values (?, ?, ?, ?, ?)",
+                   (mindmap_id, nodes, floating, data_size, mod))
+
+
+def record_map(col, note, data):
+    """record() for a map note written with `data`"""
+    nodes, floating = count_nodes(data)
+    record(col, note.id, nodes, floating, len(note['Data']))
+
+
+def remove(mindmap_ids):
+    with link_index.database() as db:
+        db.executemany("delete from map_stats where mindmap_id = ?", [(mid,) for mid in mindmap_ids])
+
+
+def all_stats():
+    """mindmap_id -> (nodes, floating, data_size, mod)"""
+    with link_index.database() as db:
+        return {row[0]: row[1:] for row in db.execute(
+            "select mindmap_id, nodes, floating, data_size, mod from map_stats")}
+
+
+def stale_maps(maps, stats):
+    """Ids of catalog entries without figures or changed since they were recorded"""
+    return [info.id for info in maps if info.id not in stats or stats[info.id][3] != info.mod]
+
+
+def measure(col, mindmap_ids):
+    """Parse and record the given maps (run in the background)"""
+    from . import node_index
+    for mindmap_id in mindmap_ids:
+        try:
+            note = col.get_note(mindmap_id)
+        except Exception:
+            continue
+        record_map(col, note, node_index.get_index(note).data)
+    return len(mindmap_ids)
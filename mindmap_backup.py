@@ -2,11 +2,12 @@
 MindMap Backup and Recovery Tool
 Provides export/import functionality to ensure data safety
 """
+import gzip
 import json
 import os
 from datetime import datetime
 from aqt import mw
-from aqt.qt import QDialog, QVBoxLayout, QPushButton, QTextEdit, QHBoxLayout, QFileDialog
+from aqt.qt import QDialog, QVBoxLayout, QPushButton, QTextEdit, QHBoxLayout, QFileDialog, QCheckBox
 from aqt.utils import showInfo, tooltip
 
 class MindMapBackupDialog(QDialog):
@@ -58,6 +59,10 @@ class MindMapBackupDialog(QDialog):
         
         layout.addLayout(btn_layout)
         
+        # Export options
+        self.chk_compact = QCheckBox()
+        layout.addWidget(self.chk_compact)
+        
         # Preview area
         self.preview = QTextEdit()
         self.preview.setReadOnly(True)
@@ -95,6 +100,7 @@ class MindMapBackupDialog(QDialog):
         self.btn_export_all.setText(texts['export_all'])
         self.btn_export_selected.setText(texts['export_selected'])
         self.btn_import.setText(texts['import'])
+        self.chk_compact.setText(texts['compact'])
         self.btn_close.setText(texts['close'])
         self.preview.setPlaceholderText(texts['preview_placeholder'])
     
@@ -108,6 +114,7 @@ class MindMapBackupDialog(QDialog):
             'export_all': "📤 Export All Mind Maps",
             'export_selected': "📋 Export Selected Mind Map",
             'import': "📥 Import Mind Maps",
+            'compact': "Compact JSON (no indentation, smaller file; save as .json.gz to also compress)",
             'close': "Close",
             'preview_placeholder': "Backup preview will be displayed here..."
         }
@@ -122,6 +129,7 @@ class MindMapBackupDialog(QDialog):
             'export_all': "📤 导出所有思维导图",
             'export_selected': "📋 导出选定的思维导图",
             'import': "📥 导入思维导图",
+            'compact': "紧凑 JSON（无缩进，文件更小；保存为 .json.gz 可进一步压缩）",
             'close': "关闭",
                         'preview_placeholder': "备份预览将显示在这里..."
         }
@@ -130,8 +138,11 @@ class MindMapBackupDialog(QDialog):
         """Export all mind maps to a single JSON file"""
         from .export_utils import export_all_mindmaps
         
-        success, filename, viewer_path, count = export_all_mindmaps(self, self.mw)
-        
+        self.btn_export_all.setEnabled(False)
+        export_all_mindmaps(self, self.mw, self.on_export_all_done, compact=self.chk_compact.isChecked())
+    
+    def on_export_all_done(self, success, filename, viewer_path, count):
+        self.btn_export_all.setEnabled(True)
         if not success:
             if count == 0:
                 showInfo("没有找到思维导图数据")
@@ -211,17 +222,22 @@ class MindMapBackupDialog(QDialog):
                 self,
                 "选择备份文件",
                 os.path.join(os.path.expanduser("~"), "Documents"),
-                "JSON Files (*.json)"
+                "JSON Files (*.json *.json.gz)"
             )
             
             if not filename:
                 return
             
-            with open(filename, 'r', encoding='utf-8') as f:
+            # Compressed backups are recognised by the gzip magic bytes
+            with open(filename, 'rb') as f:
+                compressed = f.read(2) == b'\x1f\x8b'
+            opener = gzip.open if compressed else open
+            with opener(filename, 'rt', encoding='utf-8') as f:
                 backup_data = json.load(f)
             
             # Import logic
             from .note_manager import create_new_mindmap_note, get_or_create_mindmap_model
+            from .static_renderer import store_map_data
             import uuid
             
             imported_count = 0
@@ -246,8 +262,8 @@ class MindMapBackupDialog(QDialog):
                     note['Title'] = title + " (导入)"
                     note['UUID'] = uid
                     note['AllowNewCards'] = mm.get("allow_new_cards", "1")
-                    note['Data'] = json.dumps(mm.get("data", {}))
-                    note['DisplayHTML'] = f"<h1>{title}</h1><p>(Imported from backup)</p>"
+                    data = mm.get("data", {})
+                    store_map_data(note, data)
                     
                     self.mw.col.add_note(note, 0)
                     imported_count += 1
@@ -1,12 +1,144 @@
 import json
 import os
-import base64
 from aqt import mw
 from aqt.qt import *
 from aqt.webview import AnkiWebView
+from aqt.operations import CollectionOp
+from anki.collection import OpChanges
 from aqt.qt import QDialog, QVBoxLayout
 from aqt.utils import showInfo
 from .note_manager import get_or_create_mindmap_model
+from .mindmap_patch import MindMapTree, PatchConflict
+from .static_renderer import display_hash, serialize_data, store_map_data
+from .data_codec import decode_data
+from . import node_index
+from . import map_stats
+from .chunked_bridge import ChunkAssembler, ChunkError, ChunkSender
+from .diagnostics import OpenTrace, timed
+
+WEB_DIR = os.path.join(os.path.dirname(__file__), "web")
+# How long a closing window waits for its page to send the last save
+CLOSE_TIMEOUT_MS = 5000
+
+
+def asset_url(filename):
+    """URL of a file in web/, versioned by mtime so edited assets bypass the browser cache"""
+    addon_package = mw.addonManager.addonFromModule(__name__)
+    mtime = int(os.path.getmtime(os.path.join(WEB_DIR, filename)))
+    return f"{mw.serverURL()}_addons/{addon_package}/web/{filename}?v={mtime}"
+
+
+def mathjax_url():
+    """MathJax build bundled with Anki, loaded by main.js only once a topic contains math"""
+    return f"{mw.serverURL()}_anki/js/vendor/mathjax/tex-chtml-full.js"
+
+
+def build_editor_html(data_json, focus_node_id=None, screen=None, trace=None):
+    """
+    Editor page HTML: static assets by URL, per-map bootstrap inline
+
+    data_json may be "null" for a pre-warmed page that is booted later (see editor_pool.py).
+    trace is the OpenTrace of the opening editor, if any.
+    """
+    # Static assets are served by URL so the browser and V8 code caches persist across opens
+    stylesheets = "\n".join(
+        f'<link rel="stylesheet" href="{asset_url(name)}">'
+        for name in ("jsmind.css", "style.css", "editor.css")
+    )
+
+    # Load background image if configured
+    bg_style = ""
+    config = mw.addonManager.getConfig(__name__) or {}
+    bg_filename = config.get('background_image', '')
+    if bg_filename:
+        bg_path = os.path.join(os.path.dirname(__file__), 'backgrounds', bg_filename)
+        # Screen-sized copy, made once per (file, mtime, screen size)
+        from .background_cache import background_url
+        screen = screen or QGuiApplication.primaryScreen()
+        size = screen.size() * screen.devicePixelRatio()
+        with timed(trace, 'background'):
+            bg_url = background_url(bg_path, size.width(), size.height())
+        if bg_url:
+            overlay = config.get('background_overlay', '')
+            if overlay:
+                bg_css = f"linear-gradient({overlay}, {overlay}), url('{bg_url}')"
+            else:
+                bg_css = f"url('{bg_url}')"
+
+            bg_style = f"""
+            .jsmind-inner {{
+                background-image: {bg_css} !important;
+            }}
+            """
+
+    # Construct HTML: assets by URL, per-map bootstrap inline
+    html = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="utf-8">
+        {stylesheets}
+        <style>{bg_style}</style>
+        <script src="{asset_url('jsmind.js')}"></script>
+        <script src="{asset_url('jsmind.draggable.js')}"></script>
+    </head>
+    <body>
+        <div class="toolbar">
+            <div class="menu-container">
+                <button onclick="toggleMenu()" title="Menu">☰</button>
+
+                <div id="main-menu" class="menu-content">
+                    <div style="padding: 5px 12px; font-weight:bold; color:#666; font-size:11px;">LINK ACTION</div>
+
+                    <label class="menu-item" onclick="toggleReadOnly()">
+                        <input type="checkbox" id="readonly_toggle"> Read-Only Mode
+                    </label>
+                    <div class="menu-divider"></div>
+
+                    <label class="menu-item" onclick="setJumpMode('preview')">
+                        <input type="radio" name="jump_mode" id="mode_preview" checked> Preview Card
+                    </label>
+
+                    <label class="menu-item" onclick="setJumpMode('browser')">
+                        <input type="radio" name="jump_mode" id="mode_browser"> Card Browser
+                    </label>
+
+                    <div class="menu-divider"></div>
+
+                    <div class="menu-item" onclick="toggleFullscreen()">
+                        ⛶ Toggle Fullscreen
+                    </div>
+                </div>
+            </div>
+        </div>
+
+        <div id="jsmind_container" tabindex="0" style="background: #f4f4f4; outline: none; overflow: auto;">
+        </div>
+
+        <div id="auto-save-status">Auto-saved</div>
+
+        <script src="{asset_url('virtual_view.js')}"></script>
+        <script src="{asset_url('main.js')}"></script>
+
+        <script>
+        // Per-map bootstrap: configuration and initial data
+        var hotkeyConfigFromPython = {json.dumps(config.get('hotkeys', {}))};
+        var lineColorFromPython = {json.dumps(config.get('line_color', 'rgba(139, 92, 246, 0.6)'))};
+        var enableFloatingNodesFromPython = {json.dumps(config.get('enable_floating_nodes', True))};
+        var virtualizeNodesFromPython = {json.dumps(config.get('virtualize_nodes', 3000))};
+        var initialJumpMode = {json.dumps(config.get('jump_mode', 'preview'))};
+        var initialData = {data_json};
+        var initialFocusId = {json.dumps(focus_node_id or '')};
+        var mathJaxUrl = {json.dumps(mathjax_url())};
+        </script>
+        <script src="{asset_url('editor_page.js')}"></script>
+    </body>
+    </html>
+    """
+    return html
+
+# Save counters across all editors, for diagnostics
+save_stats = {'written': 0, 'skipped': 0}
 
 class MindMapDialog(QDialog):
     @classmethod
@@ -19,6 +151,9 @@ class MindMapDialog(QDialog):
         # Check if already open
         for editor in mw.mindmap_editors:
             if editor.note_id == note_id:
+                # A window still writing its last saves is reopened rather than
+                # loading a second editor from the not yet saved note
+                editor.cancel_close()
                 editor.show()
                 editor.raise_()
                 editor.activateWindow()
@@ -44,344 +179,68 @@ class MindMapDialog(QDialog):
         self.note_id = note_id
         self.focus_node_id = focus_node_id
         self.note = mw.col.get_note(note_id)
+        # Phase timings of this open, shown in Tools > Mind Map > Diagnostics
+        self._open_trace = OpenTrace(self.note)
+        # Cached tree for incremental saves, built from the first full snapshot
+        self._tree = None
+        # Background save queue: one save in flight, later payloads wait here
+        self._pending_saves = []
+        self._save_in_flight = False
+        self._save_conflict = False
+        self._save_warning = None
+        self._refresh_after_save = False
+        self._saved_note_ids = []
+        # Changed nodes of the batch being written, and of failed batches
+        self._batch_nodes = {}
+        self._unsynced_nodes = {}
+        # Closing waits for the page's last save and for the save queue to drain
+        self._closing = False
+        self._close_ready = False
+        self._close_done = False
+        self._close_generation = 0
         self.setWindowTitle(f"Mind Map Editor - {self.note['Title']}")
         self.resize(1024, 768)
         
         # Save this as last opened mind map
         config = mw.addonManager.getConfig(__name__) or {}
         config['last_mindmap_id'] = note_id
-        mw.addonManager.writeConfig(__name__, config)
+        with self._open_trace.phase('write_config'):
+            mw.addonManager.writeConfig(__name__, config)
+        # Opt-in: re-read and compare the Data field after every save
+        self._integrity_check = config.get('save_integrity_check', False)
         
-        # Validate and clean up orphaned links before opening
-        from . import card_linker
-        card_linker.validate_and_cleanup_mindmap(self.note)
-        self._cleanup_orphaned_links()
+        # Content hash of the stored map; DisplayHTML records the hash it was rendered from
+        self._persisted_hash = display_hash(self.note['DisplayHTML'])
         
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
         
-        # Initialize WebView
-        self.web = AnkiWebView(parent=self)
+        # Initialize WebView, taking a pre-warmed one if the pool has it
+        from . import editor_pool
+        with self._open_trace.phase('pool'):
+            pooled = editor_pool.take()
+        self._open_trace.record['pooled'] = bool(pooled)
+        if pooled:
+            self.web = pooled
+            self.web.setParent(self)
+        else:
+            self.web = AnkiWebView(parent=self)
         self.web.set_bridge_command(self._on_bridge_cmd, self)
+        # Large payloads travel in acknowledged chunks (see chunked_bridge.py)
+        self._chunks_in = ChunkAssembler()
+        self._chunks_out = ChunkSender(self.web)
         self.layout.addWidget(self.web)
         
         # Load the editor assets
-        addon_dir = os.path.dirname(__file__)
-        web_dir = os.path.join(addon_dir, "web")
+        web_dir = WEB_DIR
         
-        def read_asset(filename):
-            with open(os.path.join(web_dir, filename), 'r', encoding='utf-8') as f:
-                return f.read()
-
         try:
-            # Load jsMind assets
-            jsmind_js = read_asset("jsmind.js")
-            jsmind_draggable = read_asset("jsmind.draggable.js")
-            jsmind_css = read_asset("jsmind.css")
-            style_css = read_asset("style.css")
-            main_js = read_asset("main.js")
-            
-            # Prepare data for injection
-            data_json = self.note['Data']
-            if not data_json:
-                data_json = "{}"
-            
-            # Load background image if configured
-            bg_style = ""
-            config = mw.addonManager.getConfig(__name__) or {}
-            bg_filename = config.get('background_image', '')
-            if bg_filename:
-                bg_path = os.path.join(addon_dir, 'backgrounds', bg_filename)
-                if os.path.exists(bg_path):
-                    try:
-                        with open(bg_path, 'rb') as img_file:
-                            img_data = base64.b64encode(img_file.read()).decode('utf-8')
-                            ext = os.path.splitext(bg_filename)[1].lower()
-                            mime_type = 'image/jpeg' if ext in ['.jpg', '.jpeg'] else 'image/png'
-                            
-                            overlay = config.get('background_overlay', '')
-                            if overlay:
-                                bg_css = f"linear-gradient({overlay}, {overlay}), url(data:{mime_type};base64,{img_data})"
-                            else:
-                                bg_css = f"url(data:{mime_type};base64,{img_data})"
-
-                            bg_style = f"""
-                            .jsmind-inner {{
-                                background-image: {bg_css} !important;
-                            }}
-                            """
-                    except Exception as e:
-                        print(f"Error loading background image: {e}")
-            
-            # Construct HTML with inlined assets and data
-            html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="utf-8">
-                <style>
-                {jsmind_css}
-                {style_css}
-                {bg_style}
-
-                .toolbar {{
-                    position: fixed;
-                    top: 5px;    
-                    left: 5px;     
-                    z-index: 2000;
-                    padding: 0;
-                    margin: 0;
-                    background: transparent;
-                    box-shadow: none;    
-                    width: auto;
-                    height: auto;
-                }}
-
-                .toolbar button {{
-                    background: transparent !important; 
-                    color: #aaa;   
-                    border: none;
-                    padding: 2px 4px; 
-                    border-radius: 3px;
-                    cursor: pointer;
-                    font-weight: normal;
-                    font-size: 14px; 
-                    line-height: 1;
-                    transition: all 0.2s;
-                    opacity: 0.4;   
-                    box-shadow: none;
-                }}
-                
-                .toolbar button:hover {{
-                    color: #333;    
-                    opacity: 1;
-                    background: rgba(0,0,0,0.05) !important; 
-                }}
-
-                .menu-container {{
-                    position: relative;
-                    display: inline-block;
-                }}
-                .menu-content {{
-                    display: none;
-                    position: absolute;
-                    top: 100%;
-                    left: 0;
-                    background-color: white;
-                    min-width: 160px;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                    border-radius: 4px;
-                    padding: 5px 0;
-                    z-index: 2001;
-                    border: 1px solid #eee;
-                    margin-top: 5px;
-                }}
-                .menu-content.show {{
-                    display: block;
-                }}
-                .menu-item {{
-                    padding: 8px 12px;
-                    cursor: pointer;
-                    display: flex;
-                    align-items: center;
-                    font-size: 13px;
-                    color: #333;
-                }}
-                .menu-item:hover {{
-                    background-color: #f5f5f5;
-                }}
-                .menu-item input {{
-                    margin-right: 8px;
-                }}
-                .menu-divider {{
-                    height: 1px;
-                    background-color: #eee;
-                    margin: 4px 0;
-                }}
-                
-                html, body {{
-                    margin: 0;
-                    padding: 0;
-                    width: 100%;
-                    height: 100%;
-                    overflow: hidden;
-                }}
-                
-                #jsmind_container {{
-                    position: absolute;
-                    top: 0 !important;
-                    left: 0;
-                    right: 0;
-                    bottom: 0;
-                    height: 100% !important;
-                    margin: 0;
-                    padding: 0;
-                }}
-                
-                :fullscreen #jsmind_container {{
-                    top: 0 !important;
-                    height: 100% !important;
-                }}
-                
-                #auto-save-status {{
-                    position: fixed;
-                    top: 55px;
-                    right: 10px;
-                    padding: 5px 10px;
-                    background: rgba(40, 167, 69, 0.9);
-                    color: white;
-                    border-radius: 3px;
-                    font-size: 12px;
-                    opacity: 0;
-                    transition: opacity 0.3s;
-                    z-index: 1000;
-                }}
-                
-                /* Floating nodes styles */
-                jmnode[nodeid^="floating_"] {{
-                    transition: border-color 0.2s, box-shadow 0.2s;
-                }}
-                jmnode[nodeid^="floating_"]:hover {{
-                    box-shadow: 0 4px 12px rgba(0,0,0,0.3) !important;
-                }}
-                jmnode[nodeid^="floating_"].attaching {{
-                    border-color: #4dc4ff !important;
-                    animation: pulse 0.5s infinite;
-                }}
-                @keyframes pulse {{
-                    0%, 100% {{ transform: scale(1); }}
-                    50% {{ transform: scale(1.05); }}
-                }}
-                </style>
-                <script>
-                window.MathJax = {{
-                    tex: {{
-                        inlineMath: [['\\\\(', '\\\\)'], ['$', '$']],
-                        displayMath: [['\\\\[', '\\\\]'], ['$$', '$$']]
-                    }},
-                    svg: {{
-                        fontCache: 'global'
-                    }}
-                }};
-                </script>
-                <script src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-svg.js" async></script>
-                <script>
-                {jsmind_js}
-                </script>
-                <script>
-                {jsmind_draggable}
-                </script>
-            </head>
-            <body>
-                <div class="toolbar">
-                    <div class="menu-container">
-                        <button onclick="toggleMenu()" title="Menu">☰</button>
-                        
-                        <div id="main-menu" class="menu-content">
-                            <div style="padding: 5px 12px; font-weight:bold; color:#666; font-size:11px;">LINK ACTION</div>
-
-                            <label class="menu-item" onclick="toggleReadOnly()">
-                                <input type="checkbox" id="readonly_toggle"> Read-Only Mode
-                            </label>
-                            <div class="menu-divider"></div>
-                            
-                            <label class="menu-item" onclick="setJumpMode('preview')">
-                                <input type="radio" name="jump_mode" id="mode_preview" checked> Preview Card
-                            </label>
-                            
-                            <label class="menu-item" onclick="setJumpMode('browser')">
-                                <input type="radio" name="jump_mode" id="mode_browser"> Card Browser
-                            </label>
-                            
-                            <div class="menu-divider"></div>
-                            
-                            <div class="menu-item" onclick="toggleFullscreen()">
-                                ⛶ Toggle Fullscreen
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                
-                <div id="jsmind_container" tabindex="0" style="background: #f4f4f4; outline: none; overflow: auto;">
-                </div>
-                
-                <div id="auto-save-status">Auto-saved</div>
-                
-                <script>
-                {main_js}
-                </script>
-                
-                <script>
-                // Inject hotkey configuration
-                var hotkeyConfigFromPython = {json.dumps(config.get('hotkeys', {}))};
-                var lineColorFromPython = {json.dumps(config.get('line_color', 'rgba(139, 92, 246, 0.6)'))};
-                var enableFloatingNodesFromPython = {json.dumps(config.get('enable_floating_nodes', True))};
-                var initialJumpMode = {json.dumps(config.get('jump_mode', 'preview'))};
-                
-                if (hotkeyConfigFromPython && Object.keys(hotkeyConfigFromPython).length > 0) {{
-                    hotkeyConfig = hotkeyConfigFromPython;
-                    console.log("Loaded hotkey config:", hotkeyConfig);
-                }}
-                
-                // Inject data directly
-                var initialData = {data_json};
-                var initialFocusId = "{self.focus_node_id or ''}";
-                
-                // Menu Logic
-                function toggleMenu() {{
-                    var menu = document.getElementById("main-menu");
-                    if (menu.style.display === "block") {{
-                        menu.style.display = "none";
-                    }} else {{
-                        menu.style.display = "block";
-                    }}
-                }}
-
-                // Close menu when clicking outside
-                document.addEventListener('click', function(event) {{
-                    var container = document.querySelector('.menu-container');
-                    if (!container.contains(event.target)) {{
-                        document.getElementById("main-menu").style.display = "none";
-                    }}
-                }});
-
-                function setJumpMode(mode) {{
-                    // Update UI
-                    document.getElementById('mode_' + mode).checked = true;
-                    // Save to Anki config
-                    pycmd("update_config:jump_mode=" + mode);
-                }}
-
-                // Initialize UI based on config
-                if (typeof initialJumpMode !== 'undefined') {{
-                    document.getElementById('mode_' + initialJumpMode).checked = true;
-                }}
-
-                window.onload = function() {{
-                    console.log("Window loaded. Starting init...");
-                    if (typeof initEditor === 'function') {{
-                        initEditor(initialData);
-                        
-                        if (initialFocusId) {{
-                            setTimeout(function() {{
-                                if (typeof focusNode === 'function') {{
-                                    focusNode(initialFocusId);
-                                }}
-                            }}, 800);
-                        }}
-                    }} else {{
-                        console.error("Error: initEditor function not found!");
-                    }}
-                }};
-                </script>
-            </body>
-            </html>
-            """
-            
-            # Set base URL
-            base_url = QUrl.fromLocalFile(os.path.join(web_dir, "index.html"))
-            self.web.setHtml(html, base_url)
+            if pooled:
+                self._boot_pooled()
+            else:
+                self._load_page(web_dir)
 
+            
             self.undo_shortcut = QShortcut(QKeySequence("Ctrl+Z"), self)
             self.undo_shortcut.activated.connect(lambda: self.web.eval("window.undo();"))
 
@@ -394,9 +253,45 @@ class MindMapDialog(QDialog):
         except Exception as e:
             self.web.setHtml(f"<h1>Error loading assets: {e}</h1>")
 
+    def _load_page(self, web_dir):
+        """Build and load the editor page for this map"""
+        # Prepare data for injection
+        with self._open_trace.phase('decode'):
+            data_json = decode_data(self.note['Data'])
+        if not data_json:
+            data_json = "{}"
+
+        with self._open_trace.phase('build_html'):
+            html = build_editor_html(data_json, self.focus_node_id, self.screen(), self._open_trace)
+
+        # Set base URL
+        base_url = QUrl.fromLocalFile(os.path.join(web_dir, "index.html"))
+        with self._open_trace.phase('set_html'):
+            self.web.setHtml(html, base_url)
+
+    def _boot_pooled(self):
+        """Start the editor with this map on a pre-warmed page"""
+        focus = json.dumps(self.focus_node_id or '')
+        with self._open_trace.phase('decode'):
+            data_json = decode_data(self.note['Data']) or "{}"
+        self.web.eval(f"initialFocusId = {focus};")
+        # Large maps go through the chunked transport, then boot from receiveChunk
+        if not self._chunks_out.send('init', data_json):
+            self.web.eval(f"bootEditor({data_json}, {focus});")
+
     def _on_bridge_cmd(self, cmd: str) -> None:
         if cmd.startswith("save:"):
             self._handle_save(cmd[5:])
+        elif cmd.startswith("save_full:"):
+            self._handle_save(cmd[10:], full=True)
+        elif cmd.startswith("chunk:"):
+            self._handle_chunk(cmd[6:])
+        elif cmd.startswith("chunk_ack:"):
+            transfer_id, _, seq = cmd[10:].rpartition(":")
+            self._chunks_out.ack(transfer_id, int(seq))
+        elif cmd.startswith("chunk_nack:"):
+            transfer_id, _, seq = cmd[11:].rpartition(":")
+            self._chunks_out.nack(transfer_id, int(seq))
         elif cmd.startswith("update_config:"):
             self._handle_update_config(cmd[14:])
         elif cmd == "close":
@@ -407,9 +302,44 @@ class MindMapDialog(QDialog):
             self._handle_refresh()
         elif cmd == "toggle_fullscreen":
             self._handle_toggle_fullscreen()
+        elif cmd.startswith("open_stats:"):
+            self._open_trace.add_js(json.loads(cmd[11:]))
+        elif cmd == "close_ready":
+            self._on_close_ready(self._close_generation)
+        elif cmd == "editor_ready":
+            self._open_trace.mark('ready')
+            # Page is up: check this map's links in the background
+            from . import integrity_checker
+            trace = self._open_trace
+            integrity_checker.check_map(self.note_id, on_done=lambda ms: trace.add('integrity_check', ms))
         else:
             print(f"Unknown command: {cmd}")
     
+    def _handle_chunk(self, params: str):
+        """Store one chunk of a large payload; dispatch it once complete"""
+        header_json, _, chunk = params.partition("\n")
+        header = json.loads(header_json)
+        try:
+            complete = self._chunks_in.add(header, chunk)
+        except ChunkError as e:
+            print(f"Rejected chunk: {e}")
+            self._chunks_in.discard(header['id'])
+            self.web.eval(f"if(typeof onChunkNack === 'function') onChunkNack({json.dumps(header['id'])});")
+            return
+
+        if complete:
+            cmd, payload_json = complete
+            if cmd == "save":
+                self._handle_save(payload_json)
+            elif cmd == "save_full":
+                self._handle_save(payload_json, full=True)
+            else:
+                print(f"Unknown chunked command: {cmd}")
+            if not self._save_in_flight:
+                # A refresh may have been waiting for this transfer
+                self._continue_after_save()
+        self.web.eval(f"if(typeof onChunkAck === 'function') onChunkAck({json.dumps(header['id'])}, {header['seq']});")
+
     def _on_preview_bridge_cmd(self, cmd: str) -> None:
         """Handle commands from the preview window"""
         if cmd.startswith("save_mode:"):
@@ -645,238 +575,242 @@ class MindMapDialog(QDialog):
             self.showFullScreen()
 
 
-    def _cleanup_orphaned_links(self):
-        """Remove links from cards that point to non-existent nodes, and remove noteId from nodes whose cards are deleted"""
-        try:
-            # Get all node IDs from the mindmap
-            data_str = self.note['Data']
-            if not data_str:
-                return
-            
-            data = json.loads(data_str)
-            existing_node_ids = set()
-            nodes_with_note_ids = {}  # node_id -> noteId mapping
-            
-            # Recursively collect all node IDs and noteIds
-            def collect_node_info(node):
-                if isinstance(node, dict):
-                    if 'id' in node:
-                        existing_node_ids.add(node['id'])
-                        if 'noteId' in node:
-                            nodes_with_note_ids[node['id']] = node['noteId']
-                    if 'children' in node:
-                        for child in node['children']:
-                            collect_node_info(child)
-            
-            if 'data' in data:
-                collect_node_info(data['data'])
-            
-            # Part 1: Clean up orphaned links in cards (node was deleted)
-            all_notes = self.mw.col.find_notes(f'data-mid="{self.note_id}"')
-            
-            cleaned_card_count = 0
-            for nid in all_notes:
-                try:
-                    card_note = self.mw.col.get_note(nid)
-                    modified = False
-                    
-                    # Check all fields for the mindmap link
-                    for field_name in card_note.keys():
-                        field_content = card_note[field_name]
-                        
-                        # Look for mindmap-link divs
-                        import re
-                        pattern = r'<div id="mindmap-link"\s+data-mid="(\d+)"\s+data-nid="([^"]+)"\s+style="display:none;">\s*</div>'
-                        
-                        def check_and_remove(match):
-                            nonlocal modified
-                            mid = match.group(1)
-                            node_id = match.group(2)
-                            
-                            # If this link points to our mindmap
-                            if mid == str(self.note_id):
-                                # Check if the node still exists
-                                if node_id not in existing_node_ids:
-                                    # Node doesn't exist, remove this link
-                                    modified = True
-                                    print(f"Removing orphaned link to node {node_id} from card {nid}")
-                                    return ""  # Remove the div
-                            
-                            return match.group(0)  # Keep the div
-                        
-                        new_content = re.sub(pattern, check_and_remove, field_content)
-                        if new_content != field_content:
-                            card_note[field_name] = new_content
-                    
-                    if modified:
-                        self.mw.col.update_note(card_note)
-                        cleaned_card_count += 1
-                        
-                except Exception as e:
-                    print(f"Error cleaning card {nid}: {e}")
-            
-            # Part 2: Clean up noteId from nodes whose cards are deleted
-            orphaned_note_ids = []
-            for node_id, note_id in nodes_with_note_ids.items():
-                try:
-                    # Try to get the card
-                    card_note = self.mw.col.get_note(note_id)
-                    # Card exists, check if it still has the link to this mindmap
-                    has_link = False
-                    for field_name in card_note.keys():
-                        if f'data-mid="{self.note_id}"' in card_note[field_name]:
-                            has_link = True
-                            break
-                    
-                    if not has_link:
-                        # Card exists but link was removed, clean up noteId
-                        orphaned_note_ids.append(node_id)
-                        
-                except Exception:
-                    # Card doesn't exist, mark for cleanup
-                    orphaned_note_ids.append(node_id)
-            
-            # Remove noteId from nodes
-            if orphaned_note_ids:
-                def remove_note_ids(node):
-                    if isinstance(node, dict):
-                        if 'id' in node and node['id'] in orphaned_note_ids:
-                            if 'noteId' in node:
-                                del node['noteId']
-                                print(f"Removed orphaned noteId from node {node['id']}")
-                        if 'children' in node:
-                            for child in node['children']:
-                                remove_note_ids(child)
-                
-                if 'data' in data:
-                    remove_note_ids(data['data'])
-                    # Save the updated mindmap
-                    self.note['Data'] = json.dumps(data)
-                    self.mw.col.update_note(self.note)
-            
-            if cleaned_card_count > 0 or orphaned_note_ids:
-                print(f"Cleanup complete: {cleaned_card_count} card links removed, {len(orphaned_note_ids)} node noteIds removed")
-                
-        except Exception as e:
-            print(f"Error during cleanup: {e}")
-
+    def _handle_save(self, payload_json: str, full=False):
+        """Queue a save from the editor; saves run one at a time in the background"""
+        self._pending_saves.append((payload_json, full))
+        if not self._save_in_flight:
+            self._start_save()
 
-    def _handle_save(self, payload_json: str):
-        try:
+    def _start_save(self):
+        """Write all queued payloads as one background collection operation"""
+        batch = self._pending_saves
+        self._pending_saves = []
+        self._save_in_flight = True
+        
+        CollectionOp(
+            parent=self,
+            op=lambda col: self._write_saves(col, batch),
+        ).success(self._on_save_success).failure(self._on_save_failure).run_in_background()
+
+    def _write_saves(self, col, batch):
+        """Runs in the background: apply queued payloads, then write the latest state once"""
+        self._save_conflict = False
+        self._save_warning = None
+        self._saved_note_ids = []
+        # Node edits of a batch that failed are still owed to their cards
+        changed_nodes = self._unsynced_nodes
+        self._unsynced_nodes = {}
+        self._batch_nodes = changed_nodes
+        
+        # Anything queued before the latest full snapshot is stale; only its
+        # changed nodes are still synced to cards
+        start = max([i for i, (_, full) in enumerate(batch) if full], default=0)
+        
+        for i, (payload_json, _) in enumerate(batch):
             payload = json.loads(payload_json)
-            data = payload.get("data")
-            image_html = payload.get("image_html")
-            floating_nodes = payload.get("floatingNodes", [])
-            changed_nodes = payload.get("changedNodes", [])  # Added: receive changed nodes
-            
-            print(f"DEBUG: Received changed_nodes: {changed_nodes}")
-            
-            # Combine mind map data with floating nodes
-            if data:
-                if isinstance(data, dict):
-                    data['floatingNodes'] = floating_nodes
-                # Log data to save before saving (for debugging)
-                new_data_json = json.dumps(data)
-                print(f"DEBUG: About to save data, length: {len(new_data_json)}, root topic: {data.get('data', {}).get('topic', 'N/A')}")
-                
-                self.note['Data'] = new_data_json
-            
-            if image_html:
-                self.note['DisplayHTML'] = f"<div class='mindmap-static'>{image_html}</div>"
-            
-            # Save note
-            self.mw.col.update_note(self.note)
-            
-            # Force flush to database to ensure data is written
-            self.mw.col.flush()
-            
-            # Verify data was saved (reload)
-            verification_note = self.mw.col.get_note(self.note_id)
-            verification_data = verification_note['Data']
-            print(f"DEBUG: Data saved and verified, length: {len(verification_data)}")
-            if verification_data != self.note['Data']:
-                print("WARNING: Saved data differs from what we tried to save!")
-            else:
-                print("DEBUG: Data verified - matches what we saved")
-            
-            # Sync changed nodes to linked cards
-            if changed_nodes:
-                print(f"DEBUG: Syncing {len(changed_nodes)} changed nodes to cards")
-                self._sync_nodes_to_cards(changed_nodes)
-            else:
-                print("DEBUG: No changed nodes to sync")
-            
-            # Don't reset immediately, wait for sync to complete
-            self.mw.reset()
-            
-            self.web.eval("if(typeof showToast === 'function') showToast('Saved!');")
+            for node_info in payload.get("changedNodes", []):
+                changed_nodes[node_info.get('id')] = node_info
+            if i < start:
+                continue
             
+            try:
+                if payload.get("full"):
+                    # Full snapshot: replace the cached tree
+                    data = payload.get("data")
+                    if isinstance(data, dict):
+                        data['floatingNodes'] = payload.get("floatingNodes", [])
+                    self._tree = MindMapTree(data, payload.get("version", 0))
+                else:
+                    # Patch: apply node operations to the cached tree
+                    if self._tree is None:
+                        raise PatchConflict("No cached tree to apply patch to")
+                    self._tree.apply(payload.get("base"), payload.get("version"), payload.get("ops", []))
+            except PatchConflict as e:
+                print(f"Save conflict: {e}")
+                self._tree = None
+                # A rejected full snapshot would just be rejected again
+                if not payload.get("full"):
+                    self._save_conflict = True
+        
+        if self._tree is None:
+            # Nothing to write for the map until the editor resends a full
+            # snapshot, but node edits still reach their cards
+            return self._write_notes(col, [], changed_nodes)
+        
+        # Canonical JSON: the hash is comparable with every other writer of Data
+        new_data_json, data_hash = serialize_data(self._tree.data)
+        if data_hash == self._persisted_hash:
+            # Nothing changed since the last write: no DB write, no mtime bump, no card sync
+            save_stats['skipped'] += 1
+            print(f"DEBUG: Map v{self._tree.version} unchanged, skipping save ({save_stats})")
+            return self._write_notes(col, [], changed_nodes)
+        
+        print(f"DEBUG: Saving data v{self._tree.version} ({len(batch)} queued), length: {len(new_data_json)}")
+        # Re-renders the static view only when the content changed
+        stored_data = store_map_data(self.note, self._tree.data, (new_data_json, data_hash))
+        
+        changes = self._write_notes(col, [self.note], changed_nodes)
+        node_index.invalidate(self.note_id)
+        map_stats.record(col, self.note_id, len(self._tree.nodes),
+                         len(self._tree.data.get('floatingNodes') or []), len(stored_data))
+        self._persisted_hash = data_hash
+        save_stats['written'] += 1
+        
+        # Optional: re-read the note to verify what was written
+        if self._integrity_check and col.get_note(self.note_id)['Data'] != stored_data:
+            print("WARNING: Saved data differs from what we tried to save!")
+            self._save_warning = "Warning: saved data mismatch"
+        
+        return changes
+
+    def _write_notes(self, col, notes, changed_nodes):
+        """Write the map note (if given) and the cards of changed nodes in one bulk update"""
+        # Sync changed nodes to linked cards
+        card_notes = self._collect_card_updates(col, changed_nodes.values()) if changed_nodes else []
+        notes = notes + card_notes
+        if not notes:
+            return OpChanges()
+        
+        # Map and cards are written in one bulk update (a single undo step);
+        # card-to-map sync ignores exactly these notes while they are flushed
+        from . import card_linker
+        with card_linker.suppress_card_sync([n.id for n in notes]):
+            changes = col.update_notes(notes)
+        # Without note_text Anki does not reload whatever note the Browser or
+        # reviewer shows; _refresh_affected_ui redraws only the saved ones
+        changes.note_text = False
+        self._saved_note_ids = [n.id for n in notes]
+        if card_notes:
+            print(f"DEBUG: Synced {len(card_notes)} linked cards")
+        return changes
+
+    def _on_save_success(self, changes):
+        self._save_in_flight = False
+        if self._saved_note_ids:
+            self._refresh_affected_ui(self._saved_note_ids)
+        if self._save_conflict:
+            self.web.eval("if(typeof onSaveConflict === 'function') onSaveConflict();")
+        else:
+            message = json.dumps(self._save_warning or 'Saved!')
+            self.web.eval(f"if(typeof showToast === 'function') showToast({message});")
+        self._continue_after_save()
+
+    def _refresh_affected_ui(self, note_ids):
+        """Reload the Browser editor and reviewer card if they show one of the saved notes"""
+        note_ids = set(note_ids)
+        
+        # Browser: table rows are redrawn by Anki (browser_table), the editor only if it shows a saved note
+        try:
+            from aqt import dialogs
+            browser = dialogs._dialogs.get("Browser", [None, None])[1]
+            editor = browser.editor if browser else None
+            if editor and editor.note and editor.note.id in note_ids:
+                editor.note.load()
+                editor.loadNoteKeepingFocus()
         except Exception as e:
-            print(f"Error saving: {e}")
-            import traceback
-            traceback.print_exc()
-            self.web.eval(f"if(typeof showToast === 'function') showToast('Error: {e}');")
+            print(f"Error refreshing browser: {e}")
+        
+        # Reviewer: redraw the current card if it belongs to a saved note
+        try:
+            reviewer = self.mw.reviewer
+            if self.mw.state == "review" and reviewer.card and reviewer.card.nid in note_ids:
+                from aqt.reviewer import RefreshNeeded
+                reviewer.card.load()
+                reviewer._refresh_needed = RefreshNeeded.NOTE_TEXT
+                reviewer.refresh_if_needed()
+        except Exception as e:
+            print(f"Error refreshing reviewer: {e}")
+
+    def _on_save_failure(self, exc):
+        print(f"Error saving: {exc}")
+        self._save_in_flight = False
+        # The editor has forgotten these edits; sync them with the next save
+        self._unsynced_nodes = {**self._batch_nodes, **self._unsynced_nodes}
+        # The cached tree may be half-patched, resync from a full snapshot
+        self._tree = None
+        self._save_conflict = True
+        message = json.dumps(f"Error: {exc}")
+        self.web.eval(f"if(typeof showToast === 'function') showToast({message});")
+        self.web.eval("if(typeof onSaveConflict === 'function') onSaveConflict();")
+        self._continue_after_save()
+
+    def _continue_after_save(self):
+        """Start the next queued save, or a refresh or close that was waiting for it"""
+        if self._pending_saves:
+            self._start_save()
+        elif self._refresh_after_save:
+            self._refresh_after_save = False
+            self._handle_refresh()
+        else:
+            self._finish_close()
 
-    
-    def _sync_nodes_to_cards(self, changed_nodes):
-        """Sync changed node content to linked cards"""
+    def _collect_card_updates(self, col, changed_nodes):
+        """Rewrite the Front first line of linked cards in memory, returns the notes to write"""
         import re
-        # Import cycle prevention flag
-        from . import card_linker
         
+        topics = {}
         for node_info in changed_nodes:
-            node_id = node_info.get('id')
             new_topic = node_info.get('topic', '')
-            note_id = node_info.get('noteId')
+            try:
+                note_id = int(node_info.get('noteId'))
+            except (TypeError, ValueError):
+                continue
+            if new_topic:
+                topics[note_id] = new_topic
+        
+        if not topics:
+            return []
+        
+        # Read the linked cards' fields in one query; only cards whose
+        # first line differs are loaded as notes
+        ids = ",".join(str(nid) for nid in topics)
+        rows = col.db.all(f"select id, mid, flds from notes where id in ({ids})")
+        
+        front_ords = {}
+        card_notes = []
+        for nid, mid, flds in rows:
+            if mid not in front_ords:
+                model = col.models.get(mid)
+                names = [f['name'] for f in model['flds']] if model else []
+                front_ords[mid] = names.index('Front') if 'Front' in names else None
+            if front_ords[mid] is None:
+                continue
+            
+            new_topic = topics[nid]
+            front_content = flds.split("\x1f")[front_ords[mid]]
             
-            if not note_id or not new_topic:
+            # Extract first line
+            front_text = re.sub(r'<br\s*/?>', '\n', front_content, flags=re.IGNORECASE)
+            clean_text = re.sub('<[^<]+?>', '', front_text)
+            first_line = clean_text.split('\n')[0].strip()
+            
+            if first_line == new_topic:
                 continue
             
+            # Replace first line, keep rest (preserving HTML format)
+            parts = re.split(r'<br\s*/?>', front_content, maxsplit=1, flags=re.IGNORECASE)
+            if len(parts) > 1:
+                new_front = new_topic + '<br>' + parts[1]
+            else:
+                new_front = new_topic
+            
             try:
-                # Prevent sync loop
-                card_linker._syncing_from_node = True
-                
-                # Get linked card
-                card_note = self.mw.col.get_note(note_id)
-                
-                # Check if card has Front field
-                if 'Front' not in card_note:
-                    continue
-                
-                # Get current front content
-                front_content = card_note['Front']
-                
-                # Extract first line
-                front_text = re.sub(r'<br\s*/?>', '\n', front_content, flags=re.IGNORECASE)
-                clean_text = re.sub('<[^<]+?>', '', front_text)
-                lines = clean_text.split('\n')
-                first_line = lines[0].strip() if lines else ''
-                
-                # Update if first line differs from node content
-                if first_line != new_topic:
-                    # Replace first line, keep rest
-                    # Need to preserve HTML format
-                    if '<br' in front_content.lower():
-                        # Has newline
-                        parts = re.split(r'<br\s*/?>', front_content, maxsplit=1, flags=re.IGNORECASE)
-                        if len(parts) > 1:
-                            card_note['Front'] = new_topic + '<br>' + parts[1]
-                        else:
-                            card_note['Front'] = new_topic
-                    else:
-                        # No newline, replace entire
-                        card_note['Front'] = new_topic
-                    
-                    self.mw.col.update_note(card_note)
-                    print(f"Synced mindmap node to card: '{first_line}' -> '{new_topic}'")
-                    
+                card_note = col.get_note(nid)
+                card_note['Front'] = new_front
+                card_notes.append(card_note)
+                print(f"Synced mindmap node to card: '{first_line}' -> '{new_topic}'")
             except Exception as e:
-                print(f"Error syncing node {node_id} to card {note_id}: {e}")
-            finally:
-                card_linker._syncing_from_node = False
+                print(f"Error syncing node to card {nid}: {e}")
+        
+        return card_notes
 
     def _handle_refresh(self):
         """Refresh mindmap data"""
+        if self._save_in_flight or self._pending_saves or self._chunks_in.pending():
+            # Reload once the incoming and queued saves are written
+            self._refresh_after_save = True
+            return
+        
         try:
             print(f"DEBUG: Refresh requested for note {self.note_id}")
             
@@ -886,7 +820,7 @@ class MindMapDialog(QDialog):
             
             # Completely re-fetch note (don't use self.note)
             fresh_note = self.mw.col.get_note(self.note_id)
-            data_str = fresh_note['Data']
+            data_str = decode_data(fresh_note['Data'])
             
             print(f"DEBUG: Loaded fresh data, length: {len(data_str)}")
             
@@ -901,8 +835,14 @@ class MindMapDialog(QDialog):
             
             # Update self.note with latest data
             self.note = fresh_note
+            # The editor resends a full snapshot after reloading
+            self._tree = None
+            self._persisted_hash = display_hash(fresh_note['DisplayHTML'])
             
-            # Send to JavaScript
+            # Send to JavaScript; large maps go through the chunked transport
+            if self._chunks_out.send('reload', data_str):
+                print("DEBUG: Refresh data sent in chunks")
+                return
             js_code = f"if(typeof reloadMapData === 'function') reloadMapData({data_str});"
             self.web.eval(js_code)
             print("DEBUG: Refresh command sent to JavaScript")
@@ -912,5 +852,56 @@ class MindMapDialog(QDialog):
             traceback.print_exc()
 
     def closeEvent(self, event):
-        event.accept()
+        # The window hides at once but only closes once its saves are written
+        event.ignore()
+        self._request_close()
+
+    def reject(self):
+        # Esc closes through the same path
+        if self._close_done:
+            super().reject()
+        else:
+            self._request_close()
+
+    def _saves_busy(self):
+        return self._save_in_flight or bool(self._pending_saves) or self._chunks_in.pending()
+
+    def _request_close(self):
+        if self._closing:
+            return
+        self._closing = True
+        self.hide()
+        self._prepare_page_close()
+
+    def _prepare_page_close(self):
+        self._close_ready = False
+        self._close_generation += 1
+        generation = self._close_generation
+        # The page sends its unsaved changes, then close_ready behind any transfer in progress
+        self.web.eval("if(typeof prepareClose === 'function') prepareClose(); else pycmd('close_ready');")
+        # A page that does not answer must not keep the window alive
+        QTimer.singleShot(CLOSE_TIMEOUT_MS, lambda: self._on_close_ready(generation))
+
+    def _on_close_ready(self, generation):
+        if not self._closing or generation != self._close_generation:
+            return
+        self._close_ready = True
+        self._finish_close()
+
+    def _finish_close(self):
+        if not (self._closing and self._close_ready) or self._close_done or self._saves_busy():
+            return
+        if self._save_conflict:
+            # The page is resending a full snapshot; close once that is written
+            self._save_conflict = False
+            self._prepare_page_close()
+            return
+        self._close_done = True
+        # Emits finished, which removes the window from mw.mindmap_editors
+        super().reject()
+
+    def cancel_close(self):
+        """Keep a closing window open (it is being reopened)"""
+        self._closing = False
+        self._close_ready = False
 
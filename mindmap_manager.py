@@ -4,20 +4,64 @@ from aqt.utils import showInfo, getText, askUser
 from .note_manager import create_new_mindmap_note, get_or_create_mindmap_model
 from .mindmap_editor import MindMapDialog
 import uuid
+from datetime import datetime
+
+# Columns: header, tooltip
+COLUMNS = [
+    ("", "Active: new cards can be linked to this map"),
+    ("Title", ""),
+    ("Nodes", "Nodes in the map tree"),
+    ("Linked", "Cards linked to the map"),
+    ("Floating", "Floating nodes"),
+    ("Size", "Size of the stored Data field"),
+    ("Modified", "Last modification"),
+]
+
+
+class _MapItem(QTreeWidgetItem):
+    """Row that sorts by the value stored in UserRole + 1 instead of the display text"""
+
+    def __lt__(self, other):
+        column = self.treeWidget().sortColumn() if self.treeWidget() else 0
+        mine = self.data(column, Qt.ItemDataRole.UserRole + 1)
+        theirs = other.data(column, Qt.ItemDataRole.UserRole + 1)
+        if mine is None or theirs is None:
+            # Unknown values sort first
+            return mine is None and theirs is not None
+        return mine < theirs
+
+
+def _format_size(num_bytes):
+    if num_bytes >= 1024 * 1024:
+        return f"{num_bytes / (1024 * 1024):.1f} MB"
+    return f"{max(1, round(num_bytes / 1024))} KB"
+
 
 class MindMapManager(QDialog):
     def __init__(self, mw):
         super().__init__(mw)
         self.mw = mw
         self.setWindowTitle("Mind Map Manager")
-        self.resize(600, 400)
+        self.resize(900, 450)
         
         self.layout = QVBoxLayout(self)
         
-        # List Widget
-        self.list_widget = QListWidget()
+        # Map list with sortable statistics columns
+        self.list_widget = QTreeWidget()
+        self.list_widget.setRootIsDecorated(False)
+        self.list_widget.setUniformRowHeights(True)
+        self.list_widget.setColumnCount(len(COLUMNS))
+        self.list_widget.setHeaderLabels([header for header, _ in COLUMNS])
+        for column, (_, tip) in enumerate(COLUMNS):
+            if tip:
+                self.list_widget.headerItem().setToolTip(column, tip)
+        self.list_widget.setSortingEnabled(True)
+        self.list_widget.sortByColumn(1, Qt.SortOrder.AscendingOrder)
+        self.list_widget.header().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.list_widget.header().setStretchLastSection(False)
         self.list_widget.itemDoubleClicked.connect(self.on_open)
         self.layout.addWidget(self.list_widget)
+        self._measuring = False
         
         # Buttons
         btn_layout = QHBoxLayout()
@@ -51,31 +95,77 @@ class MindMapManager(QDialog):
         
         self.refresh_list()
         
-    def refresh_list(self):
+    def refresh_list(self, measure=True):
+        selected = self.get_selected_nid()
+        self.list_widget.setSortingEnabled(False)
         self.list_widget.clear()
-        self.notes = []
         
-        ids = self.mw.col.find_notes('"note:MindMap Master"')
-        for nid in ids:
-            note = self.mw.col.get_note(nid)
-            title = note['Title']
-            # Check if AllowNewCards field exists and get its value
-            try:
-                allow_new = note['AllowNewCards']
-            except KeyError:
-                allow_new = '1'  # Default to '1' if field doesn't exist
-            
-            status_icon = "✓" if allow_new == "1" else "✗"
-            display_text = f"{status_icon} {title}"
-            
-            self.notes.append((title, nid))
-            self.list_widget.addItem(display_text)
+        # Catalog and cached statistics only; map data is never parsed here
+        from .map_catalog import display_title, list_maps
+        from . import link_index, map_stats
+        maps = list_maps(self.mw.col)
+        stats = map_stats.all_stats()
+        # None until the link index is built (in the background, see _measure)
+        linked = link_index.link_counts()
+        for info in maps:
+            nodes, floating, data_size, _ = stats.get(info.id, (None, None, None, None))
+            values = [
+                ("✓" if info.allow_new else "✗", info.allow_new),
+                (display_title(info.title), info.title.lower()),
+                (nodes, nodes),
+                (linked.get(info.id, 0), linked.get(info.id, 0)) if linked is not None else (None, None),
+                (floating, floating),
+                (_format_size(data_size) if data_size is not None else None, data_size),
+                (datetime.fromtimestamp(info.mod).strftime("%Y-%m-%d %H:%M"), info.mod),
+            ]
+            item = _MapItem()
+            for column, (text, key) in enumerate(values):
+                item.setText(column, "…" if text is None else str(text))
+                item.setData(column, Qt.ItemDataRole.UserRole + 1, key)
+                if column >= 2:
+                    item.setTextAlignment(column, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+            item.setData(0, Qt.ItemDataRole.UserRole, info.id)
+            self.list_widget.addTopLevelItem(item)
+            if info.id == selected:
+                self.list_widget.setCurrentItem(item)
+        
+        self.list_widget.setSortingEnabled(True)
+        for column in (0, 2, 3, 4, 5, 6):
+            self.list_widget.resizeColumnToContents(column)
+        
+        # Maps saved before statistics existed, or changed elsewhere (e.g. by a sync)
+        stale = map_stats.stale_maps(maps, stats)
+        if (stale or linked is None) and measure:
+            self._measure(stale)
+    
+    def _measure(self, mindmap_ids):
+        """Fill in missing statistics and the link index in the background, then refresh once"""
+        if self._measuring:
+            return
+        from aqt.operations import QueryOp
+        from . import link_index, map_stats
+        self._measuring = True
+        
+        def on_done(_):
+            self._measuring = False
+            if self.isVisible():
+                self.refresh_list(measure=False)
+        
+        def on_failure(exc):
+            self._measuring = False
+            print(f"Error measuring mind maps: {exc}")
+        
+        QueryOp(
+            parent=self,
+            op=lambda col: (link_index.ensure_built(col), map_stats.measure(col, mindmap_ids)),
+            success=on_done,
+        ).failure(on_failure).run_in_background()
             
     def get_selected_nid(self):
-        row = self.list_widget.currentRow()
-        if row < 0:
+        item = self.list_widget.currentItem()
+        if item is None:
             return None
-        return self.notes[row][1]
+        return item.data(0, Qt.ItemDataRole.UserRole)
 
     def on_new(self):
         title, ok = getText("Enter a title for the new Mind Map:")
@@ -85,6 +175,8 @@ class MindMapManager(QDialog):
         try:
             uid = str(uuid.uuid4())
             note_id = create_new_mindmap_note(title, uid)
+            from . import map_catalog
+            map_catalog.invalidate()
             self.refresh_list()
             # Select the new item
             # self.list_widget.setCurrentRow(self.list_widget.count() - 1)
@@ -113,15 +205,19 @@ class MindMapManager(QDialog):
             # Complex to parse JSON here, maybe just leave it.
             # But user expects root node to change.
             try:
-                import json
-                data = json.loads(note['Data'])
+                from .data_codec import load_data
+                from .static_renderer import store_map_data
+                data = load_data(note['Data'])
                 if data.get('nodeData') and data['nodeData'].get('id') == 'root':
                     data['nodeData']['topic'] = new_title
-                    note['Data'] = json.dumps(data)
+                    store_map_data(note, data)
             except:
                 pass
                 
             self.mw.col.update_note(note)
+            from . import node_index, map_catalog
+            node_index.invalidate(nid)
+            map_catalog.invalidate()
             self.refresh_list()
 
     def on_delete(self):
@@ -129,11 +225,14 @@ class MindMapManager(QDialog):
         if not nid:
             return
             
-        row = self.list_widget.currentRow()
-        title = self.notes[row][0]
+        title = self.list_widget.currentItem().text(1)
         
         if askUser(f"Are you sure you want to delete '{title}'? This cannot be undone."):
             self.mw.col.remove_notes([nid])
+            from . import node_index, map_catalog, map_stats
+            node_index.invalidate(nid)
+            map_catalog.invalidate()
+            map_stats.remove([nid])
             self.refresh_list()
     
     def on_toggle_active(self):
@@ -169,6 +268,9 @@ class MindMapManager(QDialog):
             note['AllowNewCards'] = new_value
             self.mw.col.update_note(note)
             
+            from . import map_catalog
+            map_catalog.invalidate()
+            
             status = "Active" if new_value == "1" else "Inactive"
             from aqt.utils import tooltip
             tooltip(f"Mind map set to: {status}")
@@ -0,0 +1,131 @@
+"""
+Incremental save protocol for the mind map editor
+main.js sends node-level operations instead of the whole tree; they are
+applied here to a cached copy of the map that is then written to the note.
+"""
+
+
+class PatchConflict(Exception):
+    """Raised when a patch cannot be applied to the cached tree"""
+
+
+class MindMapTree:
+    """
+    Cached jsMind node_tree data with an id index
+
+    Supported operations (applied in the order main.js emits them):
+        {"op": "add", "id": ..., "parent": ..., "node": {fields}}
+        {"op": "move", "id": ..., "parent": ...}
+        {"op": "remove", "id": ...}
+        {"op": "update", "id": ..., "node": {fields}}
+        {"op": "order", "id": parent_id, "children": [ids]}
+        {"op": "floating", "nodes": [floating nodes]}
+    """
+
+    def __init__(self, data, version=0):
+        if not isinstance(data, dict) or not isinstance(data.get('data'), dict):
+            raise PatchConflict("Snapshot has no root node")
+        self.data = data
+        self.version = version
+        self.nodes = {}
+        self.parents = {}
+        self._index(data['data'], None)
+
+    def _index(self, node, parent_id):
+        stack = [(node, parent_id)]
+        while stack:
+            node, parent_id = stack.pop()
+            self.nodes[node['id']] = node
+            self.parents[node['id']] = parent_id
+            for child in node.get('children', []):
+                stack.append((child, node['id']))
+
+    def _unindex(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            self.nodes.pop(node['id'], None)
+            self.parents.pop(node['id'], None)
+            stack.extend(node.get('children', []))
+
+    def _get(self, node_id):
+        node = self.nodes.get(node_id)
+        if node is None:
+            raise PatchConflict(f"Unknown node {node_id}")
+        return node
+
+    def _detach(self, node_id):
+        parent_id = self.parents.get(node_id)
+        if parent_id is None:
+            raise PatchConflict(f"Cannot detach root node {node_id}")
+        parent = self._get(parent_id)
+        parent['children'] = [c for c in parent.get('children', []) if c['id'] != node_id]
+        if not parent['children']:
+            del parent['children']
+
+    def _attach(self, node, parent_id):
+        parent = self._get(parent_id)
+        parent.setdefault('children', []).append(node)
+        self.parents[node['id']] = parent_id
+
+    def apply(self, base, version, ops):
+        """Apply a patch made against `base` and move the cache to `version`"""
+        if base != self.version:
+            raise PatchConflict(f"Patch base {base} does not match cached version {self.version}")
+
+        for op in ops:
+            kind = op.get('op')
+            node_id = op.get('id')
+
+            if kind == 'add':
+                if node_id in self.nodes:
+                    raise PatchConflict(f"Node {node_id} already exists")
+                node = dict(op.get('node') or {})
+                node.pop('children', None)
+                node['id'] = node_id
+                self._attach(node, op.get('parent'))
+                self.nodes[node_id] = node
+
+            elif kind == 'move':
+                node = self._get(node_id)
+                # Refuse to move a node into its own subtree
+                ancestor = op.get('parent')
+                while ancestor is not None:
+                    if ancestor == node_id:
+                        raise PatchConflict(f"Cannot move {node_id} into its own subtree")
+                    ancestor = self.parents.get(ancestor)
+                self._detach(node_id)
+                self._attach(node, op.get('parent'))
+
+            elif kind == 'remove':
+                node = self._get(node_id)
+                self._detach(node_id)
+                self._unindex(node)
+
+            elif kind == 'update':
+                node = self._get(node_id)
+                children = node.get('children')
+                node.clear()
+                node.update(op.get('node') or {})
+                node.pop('children', None)
+                node['id'] = node_id
+                if children:
+                    node['children'] = children
+
+            elif kind == 'order':
+                parent = self._get(node_id)
+                children = parent.get('children', [])
+                by_id = {c['id']: c for c in children}
+                order = op.get('children') or []
+                if set(order) != set(by_id) or len(order) != len(children):
+                    raise PatchConflict(f"Child order for {node_id} does not match cached children")
+                if order:
+                    parent['children'] = [by_id[cid] for cid in order]
+
+            elif kind == 'floating':
+                self.data['floatingNodes'] = op.get('nodes') or []
+
+            else:
+                raise PatchConflict(f"Unknown patch operation: {kind}")
+
+        self.version = version
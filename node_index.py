@@ -0,0 +1,145 @@
+"""
+Per-map node index cache
+Parsed mind map data with node id, parent and linked-card lookups, shared by
+the editor, card linker and reviewer so a map is parsed and walked once per
+modification instead of on every lookup.
+"""
+import json
+import threading
+from collections import OrderedDict
+from .data_codec import decode_data
+
+# Evict least recently used maps once the cached JSON exceeds this many characters
+MAX_TOTAL_SIZE = 32 * 1024 * 1024
+
+_cache = OrderedDict()   # note id -> MapIndex
+_total_size = 0
+_lock = threading.Lock()
+
+
+class MapIndex:
+    """
+    Parsed map data plus lookup tables
+
+    nodes:    node id -> node dict (the nodes inside `data`)
+    parents:  node id -> parent node id (None for the root and floating nodes)
+    note_ids: linked card note id -> node id
+    """
+
+    def __init__(self, data, key, size):
+        self.data = data
+        self.key = key
+        self.size = size
+        self.nodes = {}
+        self.parents = {}
+        self.note_ids = {}
+
+        roots = []
+        if isinstance(data.get('data'), dict):
+            roots.append(data['data'])
+        roots.extend(n for n in (data.get('floatingNodes') or []) if isinstance(n, dict))
+
+        stack = [(root, None) for root in roots]
+        while stack:
+            node, parent_id = stack.pop()
+            node_id = node.get('id')
+            if node_id is None:
+                continue
+            self.nodes[node_id] = node
+            self.parents[node_id] = parent_id
+            if 'noteId' in node:
+                self.note_ids[node['noteId']] = node_id
+            for child in node.get('children') or []:
+                if isinstance(child, dict):
+                    stack.append((child, node_id))
+
+    @property
+    def root(self):
+        return self.data.get('data')
+
+    def get(self, node_id):
+        return self.nodes.get(node_id)
+
+    def topic(self, node_id):
+        node = self.nodes.get(node_id)
+        return node.get('topic', '') if node else None
+
+    def path(self, node_id):
+        """Node ids from the root down to `node_id` ([] if unknown)"""
+        if node_id not in self.nodes:
+            return []
+        path = []
+        while node_id is not None:
+            path.append(node_id)
+            node_id = self.parents.get(node_id)
+        path.reverse()
+        return path
+
+    def node_for_note(self, note_id):
+        node_id = self.note_ids.get(note_id)
+        return self.nodes.get(node_id) if node_id is not None else None
+
+
+def _note_key(note):
+    # mod has one-second resolution; the raw length catches most same-second edits,
+    # and every local writer calls invalidate() anyway
+    return (note.mod, len(note['Data']))
+
+
+def _build(note):
+    data_str = decode_data(note['Data'])
+    data = json.loads(data_str) if data_str else {}
+    if not isinstance(data, dict):
+        data = {}
+    return MapIndex(data, _note_key(note), len(data_str))
+
+
+def _evict(note_id):
+    global _total_size
+    index = _cache.pop(note_id, None)
+    if index is not None:
+        _total_size -= index.size
+
+
+def get_index(note):
+    """
+    Index for a mind map note, parsed only if the note changed
+
+    The returned data is shared; callers that modify it must use take() instead.
+    """
+    global _total_size
+    key = _note_key(note)
+    with _lock:
+        index = _cache.get(note.id)
+        if index is not None and index.key == key:
+            _cache.move_to_end(note.id)
+            return index
+
+    index = _build(note)
+    with _lock:
+        _evict(note.id)
+        _cache[note.id] = index
+        _total_size += index.size
+        while _total_size > MAX_TOTAL_SIZE and len(_cache) > 1:
+            _evict(next(iter(_cache)))
+    return index
+
+
+def take(note):
+    """Index for a note the caller is about to modify; it is removed from the cache"""
+    index = get_index(note)
+    invalidate(note.id)
+    return index
+
+
+def invalidate(note_id):
+    """Drop a map after it was written"""
+    with _lock:
+        _evict(note_id)
+
+
+def clear():
+    global _total_size
+    with _lock:
+        _cache.clear()
+        _total_size = 0
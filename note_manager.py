@@ -1,6 +1,6 @@
-import json
 from aqt import mw
 from anki.models import NotetypeDict
+from .static_renderer import store_map_data
 
 MODEL_NAME = "MindMap Master"
 
@@ -74,8 +74,7 @@ def create_new_mindmap_note(title: str, uuid_str: str) -> int:
             "topic": title
         }
     }
-    note['Data'] = json.dumps(initial_data)
-    note['DisplayHTML'] = f"<h1>{title}</h1><p>(Open MindMap Editor to view)</p>"
+    store_map_data(note, initial_data)
     
     col.add_note(note, 0)
     return note.id
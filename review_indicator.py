@@ -1,141 +1,182 @@
 """
 Display mind map association indicator in review interface
 """
+import json
+import re
+from collections import OrderedDict
 from aqt import mw, gui_hooks
 from aqt.reviewer import Reviewer
-import re
+from .map_catalog import display_title
 
-def show_mindmap_indicator():
-    """Show mind map indicator for current card in reviewer"""
-    if not mw.reviewer or not mw.reviewer.card:
-        return
-    
-    card = mw.reviewer.card
-    note = card.note()
-    
-    # Check for mind map associations
-    mindmap_id = None
-    mindmap_title = None
-    node_id = None
-    
-    for field_name in note.keys():
-        field_content = note[field_name]
-        if 'mindmap-link' in field_content and 'data-mid=' in field_content:
-            # Extract mind map ID
-            match = re.search(r'data-mid="(\d+)"', field_content)
-            if match:
-                mindmap_id = int(match.group(1))
-                
-                # Extract node ID
-                node_match = re.search(r'data-nid="([^"]+)"', field_content)
-                if node_match:
-                    node_id = node_match.group(1)
-                
-                # Validate: Get mind map title and check node exists
-                try:
-                    import json
-                    mm_note = mw.col.get_note(mindmap_id)
-                    mindmap_title = mm_note['Title']
-                    
-                    # Validate node exists in mindmap
-                    data_str = mm_note['Data']
-                    data = json.loads(data_str)
-                    
-                    node_exists = False
-                    def check_node_exists(node):
-                        nonlocal node_exists
-                        if isinstance(node, dict):
-                            if node.get('id') == node_id:
-                                node_exists = True
-                                return
-                            if 'children' in node:
-                                for child in node['children']:
-                                    check_node_exists(child)
-                    
-                    if 'data' in data:
-                        check_node_exists(data['data'])
-                    
-                    if not node_exists:
-                        # Node was deleted, cleanup card link
-                        print(f"Node {node_id} no longer exists, cleaning up card link in review")
-                        from . import card_linker
-                        card_linker.remove_link_from_card(note, field_name)
-                        return  # Don't show indicator
-                    
-                except:
-                    # Mindmap was deleted, don't show indicator
-                    pass
-                break
-    
-    # Build pycmd parameter
-    pycmd_param = ""
-    if mindmap_id and mindmap_title:
-        pycmd_param = f"open_mindmap:{mindmap_id}"
-        if node_id:
-            pycmd_param += f":{node_id}"
-    
-    # Escape values for JavaScript
-    safe_title = mindmap_title.replace("\\", "\\\\").replace("'", "\\'").replace('"', '\\"').replace("\n", " ") if mindmap_title else ""
-    safe_pycmd = pycmd_param.replace("\\", "\\\\").replace("'", "\\'").replace('"', '\\"')
-    
-    # JavaScript to manage indicator
-    js_code = f"""
-(function() {{
-    // Remove existing indicator
-    var existing = document.getElementById('mindmap-indicator');
-    if (existing) {{
-        existing.remove();
-    }}
+# Resolved links by card note id:
+# nid -> (note mod, map mod, (mindmap_id, node_id, title, breadcrumb) or None)
+# A None result is the negative cache entry for unlinked notes
+_resolved = OrderedDict()
+_RESOLVED_SIZE = 4096
+
+# Upcoming cards resolved in the background after each question
+_PREFETCH_COUNT = 5
+_prefetch_running = False
+
+
+def _map_mod(mindmap_id, col=None):
+    return (col or mw.col).db.scalar("select mod from notes where id = ?", mindmap_id)
+
+
+def _breadcrumb(index, node_id):
+    """Plain-text topics of the node's ancestors, root first"""
+    topics = [index.topic(ancestor) or '' for ancestor in index.path(node_id)[:-1]]
+    return [re.sub('<[^<]+?>', '', topic).strip() for topic in topics]
+
+
+def _resolve(note, col=None, cleanup=True):
+    """
+    Look up and validate the link of a note, returns (note mod, map mod, result)
     
-    // Only add if there's a mind map
-    if ("{safe_title}" === "") {{
-        return;
-    }}
+    Without cleanup (background prefetch) links to deleted nodes return None
+    and are left for the main thread to remove.
+    """
+    from .link_encoding import read_link
+    from . import node_index
+    col = col or mw.col
+    link = read_link(note)
+    if not link:
+        return note.mod, None, None
+    mindmap_id, node_id, _ = link
     
-    var indicator = document.createElement('div');
-    indicator.id = 'mindmap-indicator';
-    indicator.style.cssText = 'position:fixed;top:10px;right:10px;background:linear-gradient(135deg,#667eea 0%,#764ba2 100%);color:white;padding:8px 15px;border-radius:20px;font-size:13px;font-weight:500;box-shadow:0 2px 10px rgba(0,0,0,0.2);cursor:pointer;z-index:10000;display:flex;align-items:center;gap:6px;transition:all 0.3s ease;user-select:none;';
-    indicator.title = 'Click to open mind map';
-    indicator.onclick = function() {{ pycmd("{safe_pycmd}"); }};
-    indicator.onmouseover = function() {{ this.style.transform='scale(1.05)';this.style.boxShadow='0 4px 15px rgba(0,0,0,0.3)'; }};
-    indicator.onmouseout = function() {{ this.style.transform='scale(1)';this.style.boxShadow='0 2px 10px rgba(0,0,0,0.2)'; }};
+    # Validate: Get mind map title and check node exists
+    try:
+        mm_note = col.get_note(mindmap_id)
+    except Exception:
+        # Mindmap was deleted, don't show indicator
+        return note.mod, None, None
     
-    var svg = document.createElementNS('http://www.w3.org/2000/svg','svg');
-    svg.setAttribute('width','16');
-    svg.setAttribute('height','16');
-    svg.setAttribute('viewBox','0 0 24 24');
-    svg.setAttribute('fill','none');
-    svg.setAttribute('stroke','currentColor');
-    svg.setAttribute('stroke-width','2');
+    # Validate node exists in mindmap
+    index = node_index.get_index(mm_note)
+    if index.get(node_id) is None:
+        if not cleanup:
+            return None
+        # Node was deleted, cleanup card link
+        print(f"Node {node_id} no longer exists, cleaning up card link in review")
+        from . import card_linker
+        card_linker.remove_link_from_card(note, mindmap_id)
+        return note.mod, mm_note.mod, None
     
-    [[12,12,3],[5,7,2],[19,7,2],[5,17,2],[19,17,2]].forEach(function(c){{
-        var circle=document.createElementNS('http://www.w3.org/2000/svg','circle');
-        circle.setAttribute('cx',c[0]);circle.setAttribute('cy',c[1]);circle.setAttribute('r',c[2]);
-        svg.appendChild(circle);
-    }});
+    return note.mod, mm_note.mod, (mindmap_id, node_id, mm_note['Title'], _breadcrumb(index, node_id))
+
+
+def _cached(note_id, note_mod, col=None, cache=None):
+    """Cached result if still valid, else False"""
+    cached = (_resolved if cache is None else cache).get(note_id)
+    if cached is not None and cached[0] == note_mod:
+        _, map_mod, result = cached
+        # Unlinked notes stay unlinked until the note itself changes
+        if result is None or _map_mod(result[0], col) == map_mod:
+            return result
+    return False
+
+
+def _store(note_id, entry):
+    _resolved[note_id] = entry
+    _resolved.move_to_end(note_id)
+    if len(_resolved) > _RESOLVED_SIZE:
+        _resolved.popitem(last=False)
+
+
+def resolve_indicator(note):
+    """
+    (mindmap_id, node_id, title, breadcrumb) for a card's note, or None if it has no valid link
     
-    ['M9.5 10.5L7 8','M14.5 10.5L17 8','M9.5 13.5L7 16','M14.5 13.5L17 16'].forEach(function(d){{
-        var path=document.createElementNS('http://www.w3.org/2000/svg','path');
-        path.setAttribute('d',d);
-        svg.appendChild(path);
-    }});
+    Memoized by (note id, note mod, map mod), so the answer side and repeated
+    cards cost one small query (none at all for unlinked notes).
+    """
+    result = _cached(note.id, note.mod)
+    if result is not False:
+        _resolved.move_to_end(note.id)
+        return result
     
-    indicator.appendChild(svg);
+    entry = _resolve(note)
+    _store(note.id, entry)
+    return entry[2]
+
+
+def _prefetch_op(col, cache):
+    """Resolve links of the next queued cards; also warms node_index for their maps"""
+    resolved = {}
+    queued = col.sched.get_queued_cards(fetch_limit=_PREFETCH_COUNT)
+    for queued_card in queued.cards:
+        note_id = queued_card.card.note_id
+        if note_id in resolved:
+            continue
+        note = col.get_note(note_id)
+        if _cached(note_id, note.mod, col, cache) is not False:
+            continue
+        entry = _resolve(note, col, cleanup=False)
+        if entry:
+            resolved[note_id] = entry
+    return resolved
+
+
+def _on_prefetched(resolved):
+    global _prefetch_running
+    _prefetch_running = False
+    for note_id, entry in resolved.items():
+        _store(note_id, entry)
+
+
+def _on_prefetch_failed(exc):
+    global _prefetch_running
+    _prefetch_running = False
+    print(f"Mind map prefetch failed: {exc}")
+
+
+def prefetch_upcoming():
+    """Resolve the mind map context of upcoming review cards in the background"""
+    global _prefetch_running
+    if _prefetch_running or not hasattr(mw.col.sched, 'get_queued_cards'):
+        return
+    from aqt.operations import QueryOp
+    _prefetch_running = True
+    # The background op reads a snapshot, the cache itself is only touched here
+    cache = dict(_resolved)
+    QueryOp(parent=mw, op=lambda col: _prefetch_op(col, cache), success=_on_prefetched).failure(_on_prefetch_failed).run_in_background()
+
+
+def show_mindmap_indicator():
+    """Show mind map indicator for current card in reviewer"""
+    if not mw.reviewer or not mw.reviewer.card:
+        return
     
-    var span=document.createElement('span');
-    span.style.cssText='max-width:150px;overflow:hidden;text-overflow:ellipsis;white-space:nowrap;';
-    span.textContent="{safe_title}";
-    indicator.appendChild(span);
+    card = mw.reviewer.card
+    note = card.note()
     
-    document.body.appendChild(indicator);
-}})();
-"""
+    resolved = resolve_indicator(note)
+    if resolved:
+        mindmap_id, node_id, mindmap_title, breadcrumb = resolved
+        info = {
+            'mid': mindmap_id,
+            'nid': node_id,
+            'title': display_title(mindmap_title.replace("\n", " ")),
+            'path': breadcrumb,
+        }
+        js_code = f"if(window.setMindmapIndicator) setMindmapIndicator({json.dumps(info)});"
+    else:
+        js_code = "if(window.clearMindmapIndicator) clearMindmapIndicator();"
     
     # Execute JavaScript in reviewer's web view
     if mw.reviewer and mw.reviewer.web:
         mw.reviewer.web.eval(js_code)
 
 
+def on_webview_will_set_content(web_content, context):
+    """Install the indicator script and styles once per reviewer page"""
+    if not isinstance(context, Reviewer):
+        return
+    addon_package = mw.addonManager.addonFromModule(__name__)
+    web_content.css.append(f"/_addons/{addon_package}/web/reviewer_indicator.css")
+    web_content.js.append(f"/_addons/{addon_package}/web/reviewer_indicator.js")
+
+
 def on_reviewer_pycmd(handled, cmd, _):
     """Handle command from clicking mind map indicator in review"""
     if cmd.startswith('open_mindmap:'):
@@ -156,5 +197,7 @@ def on_reviewer_pycmd(handled, cmd, _):
 
 # Register hooks - use reviewer-specific hooks
 gui_hooks.reviewer_did_show_question.append(lambda _: show_mindmap_indicator())
+gui_hooks.reviewer_did_show_question.append(lambda _: prefetch_upcoming())
 gui_hooks.reviewer_did_show_answer.append(lambda _: show_mindmap_indicator())
 gui_hooks.webview_did_receive_js_message.append(on_reviewer_pycmd)
+gui_hooks.webview_will_set_content.append(on_webview_will_set_content)
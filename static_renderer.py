@@ -0,0 +1,125 @@
+"""
+Compact static rendering of mind maps for the DisplayHTML field
+Builds nested list HTML directly from the Data JSON for review and mobile
+"""
+import hashlib
+import json
+import re
+from collections import OrderedDict
+
+# Small inline stylesheet shared by every rendered map
+_STYLE = (
+    "<style>"
+    ".mindmap-static{text-align:left;display:inline-block}"
+    ".mindmap-static ul{list-style:none;margin:0;padding-left:1.2em;border-left:1px solid #ccc}"
+    ".mindmap-static>ul{border-left:none;padding-left:0}"
+    ".mindmap-static li{margin:.15em 0}"
+    ".mindmap-static summary{cursor:pointer}"
+    ".mindmap-static .mm-floating{margin-top:.8em;opacity:.8}"
+    "</style>"
+)
+
+_HASH_PATTERN = re.compile(r'data-hash="([0-9a-f]+)"')
+
+# Rendered HTML by content hash (most recently used last)
+_cache = OrderedDict()
+_CACHE_SIZE = 32
+
+
+def content_hash(data_json):
+    """Stable hash of the Data JSON string"""
+    return hashlib.sha1(data_json.encode('utf-8')).hexdigest()[:16]
+
+
+def serialize_data(data):
+    """
+    Canonical Data JSON of a map and its content hash
+
+    Keys are sorted so the hash does not depend on how the dict was built;
+    every writer of Data goes through this, so stored hashes stay comparable.
+
+    Returns:
+        tuple: (data_json, data_hash)
+    """
+    data_json = json.dumps(data, sort_keys=True)
+    return data_json, content_hash(data_json)
+
+
+def store_map_data(note, data, serialized=None):
+    """
+    Write map data to note['Data'] and re-render DisplayHTML if it changed
+
+    serialized is the serialize_data() result if the caller already has it.
+
+    Returns:
+        str: the stored Data value
+    """
+    from .data_codec import encode_data
+    data_json, data_hash = serialized or serialize_data(data)
+    note['Data'] = encode_data(data_json)
+    update_display_html(note, data, data_json, data_hash)
+    return note['Data']
+
+
+def display_hash(display_html):
+    """Content hash a DisplayHTML value was rendered from, or None"""
+    if not display_html:
+        return None
+    match = _HASH_PATTERN.search(display_html[:200])
+    return match.group(1) if match else None
+
+
+def _render_node(node, out):
+    topic = node.get('topic', '')
+    children = node.get('children') or []
+    if children:
+        # Collapsed nodes stay collapsed in the static view
+        out.append('<li><details open>' if node.get('expanded', True) else '<li><details>')
+        out.append(f'<summary>{topic}</summary><ul>')
+        for child in children:
+            _render_node(child, out)
+        out.append('</ul></details></li>')
+    else:
+        out.append(f'<li>{topic}</li>')
+
+
+def render_display_html(data, data_hash):
+    """Render the map as nested <details>/<ul> HTML, cached by content hash"""
+    cached = _cache.get(data_hash)
+    if cached is not None:
+        _cache.move_to_end(data_hash)
+        return cached
+
+    out = [f'<div class="mindmap-static" data-hash="{data_hash}">', _STYLE, '<ul>']
+    root = data.get('data') if isinstance(data, dict) else None
+    if isinstance(root, dict):
+        _render_node(root, out)
+    out.append('</ul>')
+
+    floating = [n for n in (data.get('floatingNodes') or []) if n.get('topic')] if isinstance(data, dict) else []
+    if floating:
+        out.append('<ul class="mm-floating">')
+        for node in floating:
+            out.append(f"<li>{node['topic']}</li>")
+        out.append('</ul>')
+    out.append('</div>')
+
+    html = ''.join(out)
+    _cache[data_hash] = html
+    if len(_cache) > _CACHE_SIZE:
+        _cache.popitem(last=False)
+    return html
+
+
+def update_display_html(note, data, data_json, data_hash=None):
+    """
+    Re-render note['DisplayHTML'] if the Data content changed
+
+    Returns:
+        bool: True if the field was updated
+    """
+    data_hash = data_hash or content_hash(data_json)
+    if display_hash(note['DisplayHTML']) == data_hash:
+        return False
+    note['DisplayHTML'] = render_display_html(data, data_hash)
+    return True
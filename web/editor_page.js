@@ -0,0 +1,85 @@
+// Editor page setup, loaded after main.js and the per-map bootstrap
+// (hotkeyConfigFromPython, initialJumpMode, initialData, initialFocusId...)
+
+if (hotkeyConfigFromPython && Object.keys(hotkeyConfigFromPython).length > 0) {
+    hotkeyConfig = hotkeyConfigFromPython;
+    console.log("Loaded hotkey config:", hotkeyConfig);
+}
+
+// Menu Logic
+function toggleMenu() {
+    var menu = document.getElementById("main-menu");
+    if (menu.style.display === "block") {
+        menu.style.display = "none";
+    } else {
+        menu.style.display = "block";
+    }
+}
+
+// Close menu when clicking outside
+document.addEventListener('click', function(event) {
+    var container = document.querySelector('.menu-container');
+    if (!container.contains(event.target)) {
+        document.getElementById("main-menu").style.display = "none";
+    }
+});
+
+function setJumpMode(mode) {
+    // Update UI
+    document.getElementById('mode_' + mode).checked = true;
+    // Save to Anki config
+    pycmd("update_config:jump_mode=" + mode);
+}
+
+// Initialize UI based on config
+if (typeof initialJumpMode !== 'undefined') {
+    document.getElementById('mode_' + initialJumpMode).checked = true;
+}
+
+window.onload = function() {
+    console.log("Window loaded. Starting init...");
+    if (initialData === null) {
+        // Pre-warmed pool page without a map: wait for bootEditor()
+        pycmd('editor_ready');
+        return;
+    }
+    if (typeof initEditor === 'function') {
+        // Time since navigation start, i.e. setHtml until scripts and styles are in
+        var pageLoad = performance.now();
+        initEditor(initialData);
+        reportOpenStats({
+            page_load: pageLoad,
+            init_editor: performance.now() - pageLoad,
+            nodes: (jm && jm.mind) ? Object.keys(jm.mind.nodes).length : 0
+        });
+        pycmd('editor_ready');
+
+        if (initialFocusId) {
+            setTimeout(function() {
+                if (typeof focusNode === 'function') {
+                    focusNode(initialFocusId);
+                }
+            }, 800);
+        }
+    } else {
+        console.error("Error: initEditor function not found!");
+    }
+};
+
+// Called by Python when a pre-warmed pool page is given to a window
+function bootEditor(data, focusId) {
+    var start = performance.now();
+    initEditor(data);
+    reportOpenStats({
+        init_editor: performance.now() - start,
+        nodes: (jm && jm.mind) ? Object.keys(jm.mind.nodes).length : 0
+    });
+    pycmd('editor_ready');
+    if (focusId) {
+        setTimeout(function() {
+            if (typeof focusNode === 'function') {
+                focusNode(focusId);
+            }
+        }, 300);
+    }
+}
@@ -24,6 +24,24 @@ var floatingNodeIdPrefix = 'floating_';
 // Track changed node IDs (for syncing to cards)
 var changedNodes = new Set();
 
+// Incremental save state (see mindmap_patch.py)
+var saveVersion = 0;
+var persistedNodes = null;      // Snapshot of the tree Python has persisted
+var persistedFloating = '[]';
+var needsFullSave = true;       // Send a full snapshot with the next save
+var patchesSinceCheckpoint = 0;
+var checkpointInterval = 25;    // Full snapshot every N patches
+var saveStats = { sent: 0, skipped: 0 };
+
+// Chunked bridge transport (keep in sync with chunked_bridge.py)
+var chunkThreshold = 256 * 1024;
+var chunkSize = 128 * 1024;
+var chunkMaxRetries = 3;
+var outgoingTransfer = null;    // Transfer waiting for acks
+var bridgeQueue = [];           // Messages sent while a transfer is in flight
+var incomingTransfers = {};
+var transferCounter = 0;
+
 // Hotkey configuration (loaded from config, defaults here)
 var hotkeyConfig = {
     save: 'Ctrl+S',
@@ -88,6 +106,12 @@ function initEditor(data) {
             shortcut: { enable: false }
         });
 
+        // Very large maps only keep nodes near the viewport in the document
+        var virtualizeThreshold = (typeof virtualizeNodesFromPython !== 'undefined') ? virtualizeNodesFromPython : 3000;
+        if (virtualizeThreshold > 0 && data && data.data && countNodes(data.data) >= virtualizeThreshold) {
+            enableVirtualView(jm, { onattach: onNodesAttached });
+        }
+
         jm.add_event_listener(function (type, data) {
             if (type === 3) {
                 console.log('Detected change...');
@@ -96,6 +120,9 @@ function initEditor(data) {
             }
         });
 
+        // Math is typeset when nodes are rendered, not on a timer
+        jm.add_event_listener(onMathEvent);
+
         jm.show(data);
         saveHistory();
 
@@ -107,7 +134,6 @@ function initEditor(data) {
             document.getElementById('jsmind_container').focus();
         }, 100);
 
-        setTimeout(renderMath, 500);
         setupMultiSelection();
         setupFloatingNodes();
 
@@ -118,6 +144,10 @@ function initEditor(data) {
             });
         }
 
+        // Python has no cached tree yet, so the first save is a full snapshot
+        markPersisted();
+        needsFullSave = true;
+
         jm.add_event_listener(function (type, data) {
             // type 3 代表 edit 事件
             if (type === 3) {
@@ -517,8 +547,6 @@ function tryAttachToNode(floatingNode) {
             allJsNodes.forEach(function (node) {
                 node.style.boxShadow = '';
             });
-
-            setTimeout(renderMath, 300);
         }
     } else {
         // Reset border color
@@ -665,6 +693,9 @@ function exitFloatingNodeEditMode(floatingNode, newText) {
     isEditing = false;
     floatingNode.topic = newText || ''; // Keep empty if no text
     floatingNode.element.innerHTML = floatingNode.topic; // Use innerHTML to match jsMind
+    if (topicHasMath(floatingNode.topic)) {
+        renderMath([floatingNode.element]);
+    }
 
     saveHistory();
     scheduleAutoSave();
@@ -686,7 +717,6 @@ function addChildToFloatingNode(floatingNode) {
     jm.add_node(parentNode, childId, 'New Child');
     jm.select_node(childId);
 
-    setTimeout(renderMath, 300);
     saveHistory();
     scheduleAutoSave();
 }
@@ -808,55 +838,348 @@ function scheduleAutoSave() {
     }, autoSaveDelay);
 }
 
-function autoSave() {
-    if (!jm) return;
+// Flatten the current jsMind tree into { order, nodes } for diffing.
+// Node fields mirror jsMind's node_tree format without children.
+function snapshotNodes() {
+    var snapshot = { order: [], nodes: {} };
+    if (!jm || !jm.mind || !jm.mind.root) return snapshot;
 
-    try {
-        var mind_data = jm.get_data('node_tree');
-        var container = document.getElementById('jsmind_container');
+    function walk(node, parentId) {
+        var fields = { topic: node.topic, expanded: node.expanded };
+        if (node.parent && node.parent.isroot) {
+            fields.direction = node.direction == jsMind.direction.left ? 'left' : 'right';
+        }
+        if (node.data) {
+            for (var k in node.data) {
+                fields[k] = node.data[k];
+            }
+        }
+        var childIds = node.children.map(function (child) { return child.id; });
+        snapshot.order.push(node.id);
+        snapshot.nodes[node.id] = {
+            parent: parentId,
+            fields: fields,
+            key: JSON.stringify(fields),
+            children: childIds
+        };
+        for (var i = 0; i < node.children.length; i++) {
+            walk(node.children[i], node.id);
+        }
+    }
 
-        // Save floating nodes data
-        var floatingNodesData = floatingNodes.map(function (node) {
-            return {
-                id: node.id,
-                topic: node.topic,
-                x: node.x,
-                y: node.y
-            };
-        });
+    walk(jm.mind.root, null);
+    return snapshot;
+}
 
-        // Collect changed node information
-        var changedNodesData = [];
-        changedNodes.forEach(function (nodeId) {
-            var node = jm.get_node(nodeId);
+function getFloatingNodesData() {
+    return floatingNodes.map(function (node) {
+        return {
+            id: node.id,
+            topic: node.topic,
+            x: node.x,
+            y: node.y
+        };
+    });
+}
 
-            // jsMind stores custom data in node.data
-            var noteId = node && node.data && node.data.noteId;
+// Remember the current tree as the state Python has persisted
+function markPersisted(snapshot, floatingData) {
+    persistedNodes = snapshot || snapshotNodes();
+    persistedFloating = JSON.stringify(floatingData || getFloatingNodesData());
+}
 
-            if (noteId) {  // Only sync nodes with linked cards
-                changedNodesData.push({
-                    id: nodeId,
-                    topic: node.topic,
-                    noteId: noteId
-                });
+// Diff the current tree against the last persisted one.
+// Op order matters: add -> move -> remove -> update -> order -> floating
+function buildSaveOps(current, floatingData) {
+    var prev = persistedNodes;
+    var adds = [], moves = [], removes = [], updates = [], orders = [];
+
+    current.order.forEach(function (id) {
+        var cur = current.nodes[id];
+        var old = prev.nodes[id];
+
+        if (!old) {
+            adds.push({ op: 'add', id: id, parent: cur.parent, node: cur.fields });
+            // A new node only needs an explicit order if existing nodes moved into it
+            var hasMovedChild = cur.children.some(function (cid) { return !!prev.nodes[cid]; });
+            if (hasMovedChild) {
+                orders.push({ op: 'order', id: id, children: cur.children });
             }
-        });
+            return;
+        }
+
+        if (old.parent !== cur.parent) {
+            moves.push({ op: 'move', id: id, parent: cur.parent });
+        }
+        if (old.key !== cur.key) {
+            updates.push({ op: 'update', id: id, node: cur.fields });
+        }
+        if (old.children.join('\n') !== cur.children.join('\n')) {
+            orders.push({ op: 'order', id: id, children: cur.children });
+        }
+    });
+
+    // Only the topmost removed node of each deleted subtree is sent
+    prev.order.forEach(function (id) {
+        if (current.nodes[id]) return;
+        var parentId = prev.nodes[id].parent;
+        if (parentId === null || current.nodes[parentId]) {
+            removes.push({ op: 'remove', id: id });
+        }
+    });
+
+    var ops = adds.concat(moves, removes, updates, orders);
+
+    var floatingStr = JSON.stringify(floatingData);
+    if (floatingStr !== persistedFloating) {
+        ops.push({ op: 'floating', nodes: floatingData });
+    }
+    return ops;
+}
 
-        console.log('AutoSaving... Data nodes count:', mind_data.data ? countNodes(mind_data.data) : 0);
-        console.log('Changed nodes to sync:', changedNodesData);
+// Collect changed node information for linked cards
+function collectChangedNodes() {
+    var changedNodesData = [];
+    changedNodes.forEach(function (nodeId) {
+        var node = jm.get_node(nodeId);
+
+        // jsMind stores custom data in node.data
+        var noteId = node && node.data && node.data.noteId;
 
-        var payload = {
+        if (noteId) {  // Only sync nodes with linked cards
+            changedNodesData.push({
+                id: nodeId,
+                topic: node.topic,
+                noteId: noteId
+            });
+        }
+    });
+    return changedNodesData;
+}
+
+// Send the current state to Python.
+// A full snapshot is sent after open/reload, on conflict and every
+// checkpointInterval patches; otherwise only node operations are sent.
+// Returns false if there was nothing to save.
+function sendSave() {
+    var current = snapshotNodes();
+    var floatingData = getFloatingNodesData();
+    var changedNodesData = collectChangedNodes();
+
+    // Dirty check: skip saves that end where the persisted state is
+    // (selections, undo/redo round trips, drags that end in place)
+    var ops = persistedNodes ? buildSaveOps(current, floatingData) : null;
+    if (ops && ops.length === 0 && changedNodesData.length === 0) {
+        changedNodes.clear();
+        saveStats.skipped += 1;
+        return false;
+    }
+
+    var full = needsFullSave || !ops || patchesSinceCheckpoint >= checkpointInterval;
+    var payload;
+
+    if (full) {
+        var mind_data = jm.get_data('node_tree');
+        console.log('Saving full snapshot... Data nodes count:', mind_data.data ? countNodes(mind_data.data) : 0);
+        payload = {
+            full: true,
+            version: saveVersion + 1,
             data: mind_data,
-            image_html: container ? container.innerHTML : "",
             arrows: arrows,
-            floatingNodes: floatingNodesData,
-            changedNodes: changedNodesData  // Added
+            floatingNodes: floatingData,
+            changedNodes: changedNodesData
+        };
+    } else {
+        console.log('Saving patch with', ops.length, 'ops against version', saveVersion);
+        payload = {
+            base: saveVersion,
+            version: saveVersion + 1,
+            ops: ops,
+            changedNodes: changedNodesData
         };
+    }
 
-        pycmd("save:" + JSON.stringify(payload));
+    console.log('Changed nodes to sync:', changedNodesData);
+    // Full snapshots use their own command so Python can drop queued patches
+    sendBridgeMessage(full ? "save_full" : "save", JSON.stringify(payload));
 
-        // Clear change records
-        changedNodes.clear();
+    saveVersion += 1;
+    saveStats.sent += 1;
+    patchesSinceCheckpoint = full ? 0 : patchesSinceCheckpoint + 1;
+    needsFullSave = false;
+    markPersisted(current, floatingData);
+
+    // Clear change records
+    changedNodes.clear();
+    return true;
+}
+
+// Save counters for diagnostics
+window.getSaveStats = function () {
+    return saveStats;
+};
+
+// Called by Python when the window closes: send unsaved changes now, then
+// close_ready, which the bridge queue delivers after every pending transfer
+function prepareClose() {
+    if (autoSaveTimeout) {
+        clearTimeout(autoSaveTimeout);
+        autoSaveTimeout = null;
+    }
+    autoSave();
+    sendBridgeMessage("close_ready", "");
+}
+
+// Called by Python when a patch could not be applied to its cached tree
+function onSaveConflict() {
+    console.log('Save conflict, resending full snapshot');
+    needsFullSave = true;
+    persistedNodes = null;
+    autoSave();
+}
+
+// CRC32 of the UTF-8 bytes of a string, matching zlib.crc32 in Python
+var crcTable = null;
+var utf8Encoder = new TextEncoder();
+function crc32(str) {
+    if (!crcTable) {
+        crcTable = new Uint32Array(256);
+        for (var n = 0; n < 256; n++) {
+            var c = n;
+            for (var k = 0; k < 8; k++) {
+                c = (c & 1) ? (0xEDB88320 ^ (c >>> 1)) : (c >>> 1);
+            }
+            crcTable[n] = c;
+        }
+    }
+    var bytes = utf8Encoder.encode(str);
+    var crc = 0xFFFFFFFF;
+    for (var i = 0; i < bytes.length; i++) {
+        crc = crcTable[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+    }
+    return (crc ^ 0xFFFFFFFF) >>> 0;
+}
+
+// Split text into chunks without breaking UTF-16 surrogate pairs
+function splitChunks(text) {
+    var chunks = [];
+    var start = 0;
+    while (start < text.length) {
+        var end = Math.min(start + chunkSize, text.length);
+        var last = text.charCodeAt(end - 1);
+        if (end < text.length && last >= 0xD800 && last <= 0xDBFF) end -= 1;
+        chunks.push(text.substring(start, end));
+        start = end;
+    }
+    return chunks;
+}
+
+// Send "cmd:text" to Python. Large payloads are sent one acknowledged
+// chunk at a time; later messages wait so Python sees them in order.
+function sendBridgeMessage(cmd, text) {
+    if (outgoingTransfer) {
+        bridgeQueue.push([cmd, text]);
+        return;
+    }
+    if (text.length <= chunkThreshold) {
+        pycmd(text ? cmd + ":" + text : cmd);
+        return;
+    }
+    transferCounter += 1;
+    var chunks = splitChunks(text);
+    outgoingTransfer = {
+        id: 'js' + transferCounter,
+        cmd: cmd,
+        chunks: chunks,
+        checksums: chunks.map(crc32),
+        retries: 0
+    };
+    console.log('Sending', cmd, 'in', chunks.length, 'chunks');
+    sendChunk(0);
+}
+
+function sendChunk(seq) {
+    var t = outgoingTransfer;
+    var header = {
+        id: t.id,
+        seq: seq,
+        total: t.chunks.length,
+        cmd: t.cmd,
+        checksum: t.checksums[seq]
+    };
+    pycmd("chunk:" + JSON.stringify(header) + "\n" + t.chunks[seq]);
+}
+
+function flushBridgeQueue() {
+    var queued = bridgeQueue;
+    bridgeQueue = [];
+    for (var i = 0; i < queued.length; i++) {
+        sendBridgeMessage(queued[i][0], queued[i][1]);
+    }
+}
+
+// Called by Python after it stored a chunk
+function onChunkAck(id, seq) {
+    var t = outgoingTransfer;
+    if (!t || t.id !== id) return;
+    if (seq + 1 < t.chunks.length) {
+        sendChunk(seq + 1);
+        return;
+    }
+    outgoingTransfer = null;
+    flushBridgeQueue();
+}
+
+// Called by Python when a chunk failed its checks; the transfer restarts
+function onChunkNack(id) {
+    var t = outgoingTransfer;
+    if (!t || t.id !== id) return;
+    t.retries += 1;
+    if (t.retries <= chunkMaxRetries) {
+        sendChunk(0);
+        return;
+    }
+    console.error('Giving up on chunked transfer', id);
+    outgoingTransfer = null;
+    // Queued patches build on the lost payload; resend everything instead
+    bridgeQueue = bridgeQueue.filter(function (m) { return m[0] !== 'save' && m[0] !== 'save_full'; });
+    needsFullSave = true;
+    persistedNodes = null;
+    flushBridgeQueue();
+    autoSave();
+}
+
+// Called by Python for each chunk of a large payload it sends
+function receiveChunk(header, chunk) {
+    if (crc32(chunk) !== header.checksum) {
+        pycmd("chunk_nack:" + header.id + ":" + header.seq);
+        return;
+    }
+    var parts = incomingTransfers[header.id] || (incomingTransfers[header.id] = []);
+    if (header.seq !== parts.length) {
+        pycmd("chunk_nack:" + header.id + ":" + parts.length);
+        return;
+    }
+    parts.push(chunk);
+    pycmd("chunk_ack:" + header.id + ":" + header.seq);
+    if (parts.length < header.total) return;
+
+    delete incomingTransfers[header.id];
+    var text = parts.join('');
+    if (header.cmd === 'reload') {
+        reloadMapData(JSON.parse(text));
+    } else if (header.cmd === 'init') {
+        bootEditor(JSON.parse(text), initialFocusId);
+    } else {
+        console.warn('Unknown chunked command:', header.cmd);
+    }
+}
+
+function autoSave() {
+    if (!jm) return;
+
+    try {
+        if (!sendSave()) return;
 
         var status = document.getElementById('auto-save-status');
         if (status) {
@@ -881,12 +1204,103 @@ function countNodes(node) {
     return count;
 }
 
-function renderMath() {
-    if (typeof MathJax !== 'undefined' && MathJax.typesetPromise) {
-        MathJax.typesetPromise([document.getElementById('jsmind_container')])
-            .catch((err) => console.error("MathJax error:", err));
-    } else {
-        setTimeout(renderMath, 1000);
+// Phase timings for Tools > Mind Map > Diagnostics (milliseconds)
+function reportOpenStats(stats) {
+    pycmd('open_stats:' + JSON.stringify(stats));
+}
+
+// MathJax is loaded from Anki's copy (mathJaxUrl) only once a topic contains
+// a pair of TeX delimiters: \( \), \[ \], $$ $$ or $...$. Like TeX-aware
+// Markdown, $...$ must not start or end with a space nor be followed by a
+// digit, so amounts such as "$5 and $10" do not count as math.
+var MATH_PATTERN = /\\\([\s\S]*?\\\)|\\\[[\s\S]*?\\\]|\$\$[\s\S]+?\$\$|\$[^\s$](?:[^$]*[^\s$])?\$(?!\d)/;
+var mathJaxState = 'none'; // 'none', 'loading', 'ready' or 'failed'
+var mathJaxStart = 0;
+var mathJaxQueue = Promise.resolve();
+
+function topicHasMath(topic) {
+    return typeof topic === 'string' && MATH_PATTERN.test(topic);
+}
+
+function mapHasMath() {
+    if (jm && jm.mind) {
+        for (var id in jm.mind.nodes) {
+            if (topicHasMath(jm.mind.nodes[id].topic)) return true;
+        }
+    }
+    return floatingNodes.some(function (node) { return topicHasMath(node.topic); });
+}
+
+function loadMathJax() {
+    if (mathJaxState !== 'none' || typeof mathJaxUrl === 'undefined') return;
+    mathJaxState = 'loading';
+    mathJaxStart = performance.now();
+    window.MathJax = {
+        tex: {
+            inlineMath: [['\\(', '\\)'], ['$', '$']],
+            displayMath: [['\\[', '\\]'], ['$$', '$$']]
+        },
+        startup: {
+            typeset: false,
+            ready: function () {
+                MathJax.startup.defaultReady();
+                MathJax.startup.promise.then(function () {
+                    mathJaxState = 'ready';
+                    // Typeset everything that arrived while loading
+                    typesetMath(null);
+                    mathJaxQueue.then(function () {
+                        reportOpenStats({ mathjax: performance.now() - mathJaxStart });
+                    });
+                });
+            }
+        }
+    };
+    var script = document.createElement('script');
+    script.src = mathJaxUrl;
+    script.async = true;
+    script.onerror = function () {
+        mathJaxState = 'failed';
+        console.error("Could not load MathJax from", mathJaxUrl);
+    };
+    document.head.appendChild(script);
+}
+
+function typesetMath(elements) {
+    var targets = elements || [document.getElementById('jsmind_container')];
+    // MathJax calls must not overlap
+    mathJaxQueue = mathJaxQueue
+        .then(function () { return MathJax.typesetPromise(targets); })
+        .catch(function (err) { console.error("MathJax error:", err); });
+}
+
+// Typeset the given elements (or the whole map); loads MathJax on first use
+function renderMath(elements) {
+    if (mathJaxState === 'ready') {
+        typesetMath(elements);
+    } else if (mathJaxState === 'none' && mapHasMath()) {
+        // Whole map is typeset once loaded
+        loadMathJax();
+    }
+}
+
+// Typeset nodes that virtualized rendering brings back into the document
+function onNodesAttached(elements) {
+    var withMath = elements.filter(function (element) { return topicHasMath(element.innerHTML); });
+    if (withMath.length) {
+        renderMath(withMath);
+    }
+}
+
+// Re-typeset after jsMind (re)renders: the whole map on show, single nodes on edits
+function onMathEvent(type, data) {
+    if (type === 1 && !data.evt) {
+        // show: every node element was recreated
+        renderMath();
+    } else if (type === 3 && ['add_node', 'insert_node_before', 'insert_node_after', 'update_node'].indexOf(data.evt) >= 0) {
+        var node = jm.get_node(data.node);
+        if (node && topicHasMath(node.topic) && node._data.view) {
+            renderMath([node._data.view.element]);
+        }
     }
 }
 
@@ -895,13 +1309,13 @@ function markLinkedNodes() {
     if (!jm) return;
 
     try {
-        var allNodes = document.querySelectorAll('jmnode');
-        allNodes.forEach(function (nodeElement) {
-            var nodeId = nodeElement.getAttribute('nodeid');
-            if (!nodeId) return;
-
-            var node = jm.get_node(nodeId);
-            if (!node) return;
+        // Walk the model rather than the DOM: with virtualized rendering
+        // most node elements are detached from the document
+        var nodes = jm.mind ? jm.mind.nodes : {};
+        Object.keys(nodes).forEach(function (nodeId) {
+            var node = nodes[nodeId];
+            var nodeElement = node._data.view && node._data.view.element;
+            if (!nodeElement) return;
 
             // Check if node has a linked card (noteId in node.data)
             var hasCard = node.data && node.data.noteId;
@@ -917,6 +1331,25 @@ function markLinkedNodes() {
     }
 }
 
+// Called by the background integrity checker with nodes whose card was
+// deleted or no longer links back. Not recorded in undo history, so undo
+// cannot bring a dead link back.
+window.unlinkNodes = function (nodeIds) {
+    if (!jm) return;
+    var changed = false;
+    nodeIds.forEach(function (nodeId) {
+        var node = jm.get_node(nodeId);
+        if (node && node.data && node.data.noteId) {
+            delete node.data.noteId;
+            changed = true;
+        }
+    });
+    if (changed) {
+        markLinkedNodes();
+        scheduleAutoSave();
+    }
+};
+
 function addChild() {
     if (!jm) return;
     var selected = jm.get_selected_node();
@@ -927,7 +1360,6 @@ function addChild() {
     var newId = 'node_' + Date.now();
     jm.add_node(selected, newId, 'New Child');
     jm.select_node(newId);
-    setTimeout(renderMath, 300);
     saveHistory();
     scheduleAutoSave();
 }
@@ -944,7 +1376,6 @@ function addSibling() {
     var newId = 'node_' + Date.now();
     jm.add_node(parent, newId, 'New Sibling');
     jm.select_node(newId);
-    setTimeout(renderMath, 300);
     saveHistory();
     scheduleAutoSave();
 }
@@ -952,49 +1383,7 @@ function addSibling() {
 function saveMap() {
     if (!jm) return;
     try {
-        var mind_data = jm.get_data('node_tree');
-        var container = document.getElementById('jsmind_container');
-
-        // Save floating nodes data
-        var floatingNodesData = floatingNodes.map(function (node) {
-            return {
-                id: node.id,
-                topic: node.topic,
-                x: node.x,
-                y: node.y
-            };
-        });
-
-        // Collect changed node information
-        var changedNodesData = [];
-        changedNodes.forEach(function (nodeId) {
-            var node = jm.get_node(nodeId);
-
-            // jsMind stores custom data in node.data
-            var noteId = node && node.data && node.data.noteId;
-
-            if (noteId) {  // Only sync nodes with linked cards
-                changedNodesData.push({
-                    id: nodeId,
-                    topic: node.topic,
-                    noteId: noteId
-                });
-            }
-        });
-
-        console.log('Changed nodes to sync:', changedNodesData);
-
-        var payload = {
-            data: mind_data,
-            image_html: container ? container.innerHTML : "",
-            arrows: arrows,
-            floatingNodes: floatingNodesData,
-            changedNodes: changedNodesData  // Added
-        };
-        pycmd("save:" + JSON.stringify(payload));
-
-        // Clear change records
-        changedNodes.clear();
+        sendSave();
 
         var status = document.getElementById('auto-save-status');
         if (status) {
@@ -1029,8 +1418,8 @@ function refreshMap() {
     if (!jm) return;
 
     console.log('Requesting data refresh...');
-    // Request fresh data from Python
-    pycmd("refresh_data");
+    // Request fresh data from Python, behind any save still being sent
+    sendBridgeMessage("refresh_data", "");
 }
 
 // Toggle fullscreen mode (maximize window in Anki)
@@ -1082,6 +1471,10 @@ function reloadMapData(data) {
         // Reload the data
         jm.show(data);
 
+        // Python dropped its cached tree on refresh, resync with a full snapshot
+        markPersisted();
+        needsFullSave = true;
+
         // Re-setup the update_node override after reload
         if (jm && jm.update_node) {
             var originalUpdateNode = jm.update_node;
@@ -1119,9 +1512,6 @@ function reloadMapData(data) {
             }
         }
 
-        // Re-render math
-        setTimeout(renderMath, 300);
-
         // Mark linked nodes after reload
         setTimeout(markLinkedNodes, 400);
 
@@ -1231,20 +1621,33 @@ function toggleArrowMode() {
     }
 }
 
+// Position of a shown node in map coordinates, from jsMind's layout rather
+// than the DOM (the virtual view detaches off-screen node elements)
+function getNodeBox(node) {
+    var vd = node && node._data.view;
+    if (!vd || vd.abs_x === undefined || !jm.layout.is_visible(node)) return null;
+    return {
+        top: vd.abs_y,
+        centerX: vd.abs_x + vd.width / 2,
+        centerY: vd.abs_y + vd.height / 2,
+        width: vd.width,
+        height: vd.height
+    };
+}
+
 // Get all nodes at the same depth level and side, sorted by vertical position
 function getNodesAtDepth(depth, filterSide) {
     var allNodes = [];
 
     function traverse(node, currentDepth) {
         if (currentDepth === depth) {
-            var elem = document.querySelector('jmnode[nodeid="' + node.id + '"]');
-            if (elem) {
-                var rect = elem.getBoundingClientRect();
+            var box = getNodeBox(node);
+            if (box) {
                 allNodes.push({
                     node: node,
-                    top: rect.top,
-                    centerY: rect.top + rect.height / 2,
-                    centerX: rect.left + rect.width / 2
+                    top: box.top,
+                    centerY: box.centerY,
+                    centerX: box.centerX
                 });
             }
         }
@@ -1265,20 +1668,12 @@ function getNodesAtDepth(depth, filterSide) {
 
     // Filter by side if specified
     if (filterSide !== null && filterSide !== undefined) {
-        var rootElem = document.querySelector('jmnode[nodeid="' + root.id + '"]');
-        if (rootElem) {
-            var rootCenterX = rootElem.getBoundingClientRect().left + rootElem.getBoundingClientRect().width / 2;
-            allNodes = allNodes.filter(function (item) {
-                if (filterSide === 'left') {
-                    return item.centerX < rootCenterX;
-                } else if (filterSide === 'right') {
-                    return item.centerX > rootCenterX;
-                } else if (filterSide === 'center') {
-                    return item.node.id === root.id;
-                }
-                return true;
-            });
-        }
+        allNodes = allNodes.filter(function (item) {
+            if (filterSide === 'center') {
+                return item.node.id === root.id;
+            }
+            return item.node.isroot || getNodeSide(item.node) === filterSide;
+        });
     }
 
     // Sort by vertical position
@@ -1302,27 +1697,18 @@ function getNodeDepth(node) {
 function getNodeSide(node) {
     if (node.isroot) return 'center';
 
-    var root = jm.get_root();
-    var rootElem = document.querySelector('jmnode[nodeid="' + root.id + '"]');
-    var nodeElem = document.querySelector('jmnode[nodeid="' + node.id + '"]');
-
-    if (!rootElem || !nodeElem) return null;
-
-    var rootCenterX = rootElem.getBoundingClientRect().left + rootElem.getBoundingClientRect().width / 2;
-    var nodeCenterX = nodeElem.getBoundingClientRect().left + nodeElem.getBoundingClientRect().width / 2;
-
-    return nodeCenterX < rootCenterX ? 'left' : 'right';
+    // Every node inherits the side of its top-level branch
+    return node.direction === jsMind.direction.left ? 'left' : 'right';
 }
 
 // Get closest child by vertical distance
 function getClosestChild(parentNode) {
     if (!parentNode.children || parentNode.children.length === 0) return null;
 
-    var parentElem = document.querySelector('jmnode[nodeid="' + parentNode.id + '"]');
-    if (!parentElem) return null;
+    var parentBox = getNodeBox(parentNode);
+    if (!parentBox) return null;
 
-    var parentRect = parentElem.getBoundingClientRect();
-    var parentCenterY = parentRect.top + parentRect.height / 2;
+    var parentCenterY = parentBox.centerY;
 
     var closest = null;
     var minDist = Infinity;
@@ -1332,11 +1718,9 @@ function getClosestChild(parentNode) {
         var childNode = jm.get_node(childId);
         if (!childNode) continue;
 
-        var childElem = document.querySelector('jmnode[nodeid="' + childId + '"]');
-        if (childElem) {
-            var childRect = childElem.getBoundingClientRect();
-            var childCenterY = childRect.top + childRect.height / 2;
-            var dist = Math.abs(childCenterY - parentCenterY);
+        var childBox = getNodeBox(childNode);
+        if (childBox) {
+            var dist = Math.abs(childBox.centerY - parentCenterY);
 
             if (dist < minDist || (dist === minDist && closest === null)) {
                 minDist = dist;
@@ -1350,24 +1734,17 @@ function getClosestChild(parentNode) {
 
 // Scroll node into view smoothly (XMind-style)
 function scrollToNode(nodeId) {
-    var nodeElem = document.querySelector('jmnode[nodeid="' + nodeId + '"]');
-    if (!nodeElem) return;
+    var box = getNodeBox(jm.get_node(nodeId));
+    if (!box) return;
 
     // Get jsMind's scroll container (the actual panel that scrolls)
     var container = jm.view.e_panel;
-    if (!container) {
-        container = document.getElementById('jsmind_container');
-    }
     if (!container) return;
 
-    var nodeRect = nodeElem.getBoundingClientRect();
-    var containerRect = container.getBoundingClientRect();
-
     // Calculate target scroll position to center the node
-    var targetScrollLeft = container.scrollLeft + nodeRect.left - containerRect.left -
-        (containerRect.width - nodeRect.width) / 2;
-    var targetScrollTop = container.scrollTop + nodeRect.top - containerRect.top -
-        (containerRect.height - nodeRect.height) / 2;
+    var zoom = jm.view.actualZoom || 1;
+    var targetScrollLeft = box.centerX * zoom - container.clientWidth / 2;
+    var targetScrollTop = box.centerY * zoom - container.clientHeight / 2;
 
     var startScrollLeft = container.scrollLeft;
     var startScrollTop = container.scrollTop;
@@ -1461,24 +1838,17 @@ function navigateLeft() {
     // If at root, go to left-side closest child
     if (selected.isroot) {
         if (selected.children && selected.children.length > 0) {
-            var rootElem = document.querySelector('jmnode[nodeid="' + selected.id + '"]');
-            if (!rootElem) return;
-            var rootRect = rootElem.getBoundingClientRect();
-            var rootCenterX = rootRect.left + rootRect.width / 2;
-            var rootCenterY = rootRect.top + rootRect.height / 2;
+            var rootBox = getNodeBox(selected);
+            if (!rootBox) return;
 
             var leftChildren = [];
             for (var i = 0; i < selected.children.length; i++) {
                 var childId = (typeof selected.children[i] === 'string') ? selected.children[i] : selected.children[i].id;
-                var childElem = document.querySelector('jmnode[nodeid="' + childId + '"]');
-                if (childElem) {
-                    var childRect = childElem.getBoundingClientRect();
-                    var childCenterX = childRect.left + childRect.width / 2;
-                    if (childCenterX < rootCenterX) {
-                        var childCenterY = childRect.top + childRect.height / 2;
-                        var dist = Math.abs(childCenterY - rootCenterY);
-                        leftChildren.push({ id: childId, dist: dist });
-                    }
+                var childNode = jm.get_node(childId);
+                var childBox = getNodeBox(childNode);
+                if (childBox && getNodeSide(childNode) === 'left') {
+                    var dist = Math.abs(childBox.centerY - rootBox.centerY);
+                    leftChildren.push({ id: childId, dist: dist });
                 }
             }
 
@@ -1518,24 +1888,17 @@ function navigateRight() {
     // If at root, go to right-side closest child
     if (selected.isroot) {
         if (selected.children && selected.children.length > 0) {
-            var rootElem = document.querySelector('jmnode[nodeid="' + selected.id + '"]');
-            if (!rootElem) return;
-            var rootRect = rootElem.getBoundingClientRect();
-            var rootCenterX = rootRect.left + rootRect.width / 2;
-            var rootCenterY = rootRect.top + rootRect.height / 2;
+            var rootBox = getNodeBox(selected);
+            if (!rootBox) return;
 
             var rightChildren = [];
             for (var i = 0; i < selected.children.length; i++) {
                 var childId = (typeof selected.children[i] === 'string') ? selected.children[i] : selected.children[i].id;
-                var childElem = document.querySelector('jmnode[nodeid="' + childId + '"]');
-                if (childElem) {
-                    var childRect = childElem.getBoundingClientRect();
-                    var childCenterX = childRect.left + childRect.width / 2;
-                    if (childCenterX > rootCenterX) {
-                        var childCenterY = childRect.top + childRect.height / 2;
-                        var dist = Math.abs(childCenterY - rootCenterY);
-                        rightChildren.push({ id: childId, dist: dist });
-                    }
+                var childNode = jm.get_node(childId);
+                var childBox = getNodeBox(childNode);
+                if (childBox && getNodeSide(childNode) === 'right') {
+                    var dist = Math.abs(childBox.centerY - rootBox.centerY);
+                    rightChildren.push({ id: childId, dist: dist });
                 }
             }
 
@@ -1955,8 +2318,6 @@ function exitEditMode() {
         console.log('Auto-refreshing to fix node position...');
         refreshMap();
     }, 100);
-
-    setTimeout(renderMath, 300);
 }
 
 // Handle clicks during edit mode - capture phase to intercept early
@@ -2172,10 +2533,6 @@ document.addEventListener('paste', function (e) {
                 window.saveHistory();
                 scheduleAutoSave();
             }
-
-            if (typeof renderMath === 'function') {
-                setTimeout(renderMath, 100);
-            }
         }
     }
 });
@@ -0,0 +1,77 @@
+// Mind map badge for the reviewer.
+// Installed once per reviewer page; Python then calls
+// setMindmapIndicator({mid, nid, title, path}) or clearMindmapIndicator() per card.
+(function () {
+    var SVG_NS = 'http://www.w3.org/2000/svg';
+    var indicator = null;
+    var titleSpan = null;
+    var pathSpan = null;
+    var current = null;
+
+    function buildIcon() {
+        var svg = document.createElementNS(SVG_NS, 'svg');
+        svg.setAttribute('width', '16');
+        svg.setAttribute('height', '16');
+        svg.setAttribute('viewBox', '0 0 24 24');
+        svg.setAttribute('fill', 'none');
+        svg.setAttribute('stroke', 'currentColor');
+        svg.setAttribute('stroke-width', '2');
+
+        [[12, 12, 3], [5, 7, 2], [19, 7, 2], [5, 17, 2], [19, 17, 2]].forEach(function (c) {
+            var circle = document.createElementNS(SVG_NS, 'circle');
+            circle.setAttribute('cx', c[0]);
+            circle.setAttribute('cy', c[1]);
+            circle.setAttribute('r', c[2]);
+            svg.appendChild(circle);
+        });
+
+        ['M9.5 10.5L7 8', 'M14.5 10.5L17 8', 'M9.5 13.5L7 16', 'M14.5 13.5L17 16'].forEach(function (d) {
+            var path = document.createElementNS(SVG_NS, 'path');
+            path.setAttribute('d', d);
+            svg.appendChild(path);
+        });
+        return svg;
+    }
+
+    function ensureIndicator() {
+        if (indicator && document.body.contains(indicator)) return;
+        indicator = document.createElement('div');
+        indicator.id = 'mindmap-indicator';
+        indicator.className = 'hidden';
+        indicator.title = 'Click to open mind map';
+        indicator.onclick = function () {
+            if (!current) return;
+            var cmd = 'open_mindmap:' + current.mid;
+            if (current.nid) cmd += ':' + current.nid;
+            pycmd(cmd);
+        };
+        indicator.appendChild(buildIcon());
+
+        titleSpan = document.createElement('span');
+        titleSpan.className = 'mindmap-indicator-title';
+        indicator.appendChild(titleSpan);
+
+        pathSpan = document.createElement('span');
+        pathSpan.className = 'mindmap-indicator-path';
+        indicator.appendChild(pathSpan);
+
+        document.body.appendChild(indicator);
+    }
+
+    window.setMindmapIndicator = function (info) {
+        current = info;
+        ensureIndicator();
+        titleSpan.textContent = info.title;
+        // Ancestors of the linked node below the root, e.g. "Chapter › Section"
+        var path = (info.path || []).slice(1).filter(function (t) { return t; });
+        pathSpan.textContent = path.length ? path.join(' \u203a ') : '';
+        pathSpan.style.display = path.length ? '' : 'none';
+        indicator.title = 'Click to open mind map' + (info.path && info.path.length ? '\n' + info.path.join(' \u203a ') : '');
+        indicator.className = '';
+    };
+
+    window.clearMindmapIndicator = function () {
+        current = null;
+        if (indicator) indicator.className = 'hidden';
+    };
+})();
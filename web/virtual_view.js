@@ -0,0 +1,156 @@
+// Viewport-virtualized rendering for very large maps.
+// jsMind still lays out the whole tree, but only node elements in or near the
+// visible part of the panel stay in the document. The others are kept
+// detached, with position and styles up to date, and are re-attached as the
+// user pans. Connector lines are drawn for the same region only.
+//
+// Elements are detached rather than destroyed because the editor keeps
+// references to node._data.view.element (selection, linking, editing).
+
+function enableVirtualView(jm, options) {
+    var view = jm.view;
+    if (!view || view.virtual) return;
+    options = options || {};
+
+    var lastSync = null;  // viewport centre of the last sync, in map coordinates
+    var pending = false;
+
+    // Visible panel area plus one screen on each side, in map coordinates
+    function renderRect() {
+        var zoom = view.actualZoom || 1;
+        var panel = view.e_panel;
+        var w = panel.clientWidth / zoom;
+        var h = panel.clientHeight / zoom;
+        var x = panel.scrollLeft / zoom;
+        var y = panel.scrollTop / zoom;
+        return { x1: x - w, y1: y - h, x2: x + 2 * w, y2: y + 2 * h, cx: x + w / 2, cy: y + h / 2, w: w, h: h };
+    }
+
+    function isPinned(node) {
+        return (view.selected_node && view.selected_node.id === node.id) ||
+            (view.editing_node && view.editing_node.id === node.id) ||
+            (typeof editingNodeId !== 'undefined' && editingNodeId === node.id);
+    }
+
+    function attach(node, attachedList) {
+        var vd = node._data.view;
+        if (!vd || !vd.element || vd.element.parentNode === view.e_nodes) return;
+        if (vd.expander) view.e_nodes.appendChild(vd.expander);
+        view.e_nodes.appendChild(vd.element);
+        if (attachedList) attachedList.push(vd.element);
+    }
+
+    function detach(node) {
+        var vd = node._data.view;
+        if (!vd || !vd.element || vd.element.parentNode !== view.e_nodes) return;
+        view.e_nodes.removeChild(vd.element);
+        if (vd.expander && vd.expander.parentNode === view.e_nodes) {
+            view.e_nodes.removeChild(vd.expander);
+        }
+    }
+
+    function attachSubtree(node) {
+        attach(node);
+        for (var i = 0; i < node.children.length; i++) {
+            attachSubtree(node.children[i]);
+        }
+    }
+
+    function syncNodes() {
+        if (!jm.mind) return;
+        var r = renderRect();
+        var attached = [];
+        var nodes = jm.mind.nodes;
+        for (var nodeid in nodes) {
+            var node = nodes[nodeid];
+            var vd = node._data.view;
+            if (!vd || !vd.element) continue;
+            var inside = view.layout.is_visible(node) && vd.abs_x !== undefined &&
+                vd.abs_x < r.x2 && vd.abs_x + vd.width > r.x1 &&
+                vd.abs_y < r.y2 && vd.abs_y + vd.height > r.y1;
+            if (inside || isPinned(node)) {
+                attach(node, attached);
+            } else {
+                detach(node);
+            }
+        }
+        lastSync = r;
+        if (attached.length && options.onattach) {
+            options.onattach(attached);
+        }
+    }
+
+    // Lines are only drawn where nodes are rendered
+    view.show_lines = function () {
+        this.clear_lines();
+        var r = lastSync || renderRect();
+        var offset = this.get_view_offset();
+        var nodes = jm.mind.nodes;
+        for (var nodeid in nodes) {
+            var node = nodes[nodeid];
+            if (node.isroot) continue;
+            if (('visible' in node._data.layout) && !node._data.layout.visible) continue;
+            var pin = this.layout.get_node_point_in(node);
+            var pout = this.layout.get_node_point_out(node.parent);
+            var x1 = Math.min(pin.x, pout.x) + offset.x;
+            var x2 = Math.max(pin.x, pout.x) + offset.x;
+            var y1 = Math.min(pin.y, pout.y) + offset.y;
+            var y2 = Math.max(pin.y, pout.y) + offset.y;
+            if (x2 < r.x1 || x1 > r.x2 || y2 < r.y1 || y1 > r.y2) continue;
+            this.graph.draw_line(pout, pin, offset);
+        }
+    };
+
+    var showNodes = view.show_nodes;
+    view.show_nodes = function () {
+        showNodes.call(this);
+        syncNodes();
+    };
+
+    // jsMind measures and removes elements directly, so they must be attached first
+    var removeNode = view.remove_node;
+    view.remove_node = function (node) {
+        attachSubtree(node);
+        return removeNode.call(this, node);
+    };
+
+    var updateNode = view.update_node;
+    view.update_node = function (node) {
+        attach(node);
+        return updateNode.call(this, node);
+    };
+
+    var selectNode = view.select_node;
+    view.select_node = function (node) {
+        if (node) attach(node);
+        return selectNode.call(this, node);
+    };
+
+    var editNodeBegin = view.edit_node_begin;
+    view.edit_node_begin = function (node) {
+        attach(node);
+        return editNodeBegin.call(this, node);
+    };
+
+    // Re-sync once the viewport has moved half a screen since the last sync
+    view.e_panel.addEventListener('scroll', function () {
+        if (pending) return;
+        pending = true;
+        requestAnimationFrame(function () {
+            pending = false;
+            var r = renderRect();
+            if (lastSync && Math.abs(r.cx - lastSync.cx) < r.w / 2 && Math.abs(r.cy - lastSync.cy) < r.h / 2) {
+                return;
+            }
+            syncNodes();
+            view.show_lines();
+        });
+    });
+
+    view.virtual = true;
+    if (jm.mind) {
+        view.show_nodes();
+        view.show_lines();
+    }
+    console.log("Virtualized rendering enabled");
+}